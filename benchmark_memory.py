@@ -0,0 +1,147 @@
+"""
+Порівняння пам'яті: дані тайтлів як списки рядків (get_all_values) та як компактні TitleData;
+
+Генерує синтетичні аркуші (типово 500 тайтлів × 1000 розділів; з бетою — 18 колонок); рядки
+проходять через json.loads; як відповідь Sheets API; тож кожна клітинка — окремий об'єкт str;
+Списки рядків вимірюються на вибірці тайтлів (--raw-sample) і масштабуються: повний обсяг
+займає гігабайти; TitleData будуються для всіх тайтлів; пам'ять вимірюється tracemalloc;
+
+Приклад: python benchmark_memory.py --titles 500 --chapters 1000
+"""
+import argparse
+import gc
+import json
+import logging
+import random
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+import main
+
+ROLE_NAMES = ['клін', 'переклад', 'тайп', 'редакт', 'бета']
+
+def generate_title_json(seed, title_index, chapters, nicknames):
+    """JSON аркуша тайтлу у форматі values (як відповідь values_get); відтворюваний для (seed; title_index);"""
+    rng = random.Random(f'{seed}:{title_index}')
+    headers = main.generate_sheet_headers(include_beta=True)
+    team = '; '.join(f'{role} - {rng.choice(nicknames)}' for role in ROLE_NAMES)
+    schema = main.SheetSchema(headers)
+    start = date(2024, 1, 1) + timedelta(days=rng.randint(0, 300))
+    rows = [[f'Тайтл {title_index}'], [team], headers]
+    for chapter in range(1, chapters + 1):
+        row = [''] * len(headers)
+        # Кожен двадцятий розділ — дробовий (20.5)
+        row[0] = f'{chapter - 1}.5' if chapter % 20 == 0 else str(chapter)
+        done_roles = rng.randint(0, len(schema.roles))
+        for position, (nick_index, date_index, status_index) in enumerate(schema.roles.values()):
+            if position < done_roles:
+                row[status_index] = '✅'
+                if nick_index is not None:
+                    row[nick_index] = rng.choice(nicknames)
+                row[date_index] = (start + timedelta(days=chapter // 3 + position)).strftime('%d.%m.%Y')
+            else:
+                row[status_index] = '❌'
+                if position == done_roles and nick_index is not None and rng.random() < 0.3:
+                    row[nick_index] = rng.choice(nicknames) # Завдання в роботі (⏳)
+        rows.append(row)
+    return json.dumps({'values': rows}, ensure_ascii=False)
+
+def traced_size(build):
+    """Пам'ять (байти); що залишається зайнятою об'єктами; які повертає build();"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        result = build()
+        gc.collect()
+        size = tracemalloc.get_traced_memory()[0] - baseline
+    finally:
+        tracemalloc.stop()
+    return size, result
+
+def run(args):
+    nicknames = [f'Перекладач{i}' for i in range(args.nicknames)]
+
+    def title_values(i):
+        return json.loads(generate_title_json(args.seed, i, args.chapters, nicknames))['values']
+
+    headers = main.generate_sheet_headers(include_beta=True)
+    schema = main.SheetSchema(headers)
+
+    # 1. Списки рядків (як зберігав _title_values); на вибірці
+    sample = min(args.raw_sample, args.titles)
+    raw_size, raw = traced_size(lambda: {i: title_values(i) for i in range(sample)})
+    raw_total = raw_size * args.titles / sample
+    del raw
+
+    # 2. Компактні TitleData для всіх тайтлів (значення кожного аркуша звільняються одразу після конвертації)
+    nick_table = main.StringTable()
+
+    build_seconds = 0.0
+
+    def build_compact():
+        nonlocal build_seconds
+        compact = {}
+        for i in range(args.titles):
+            values = title_values(i)
+            started = time.perf_counter()
+            compact[i] = main.TitleData.from_values(values, schema, nick_table)
+            build_seconds += time.perf_counter() - started
+        return compact
+
+    compact_total, compact = traced_size(build_compact)
+
+    # 3. Рендеринг статусу з рядків-виглядів (час на тайтл)
+    started = time.perf_counter()
+    for title_data in list(compact.values())[:sample]:
+        for row in title_data.rows():
+            row.label
+            for position in range(len(title_data.roles)):
+                row.status_code(position)
+                row.nick(position)
+    render_ms = (time.perf_counter() - started) * 1000 / sample
+
+    rows = args.titles * args.chapters
+    return {
+        'titles': args.titles,
+        'chapters_per_title': args.chapters,
+        'columns': len(headers),
+        'raw_sample_titles': sample,
+        'raw_bytes': int(raw_total),
+        'raw_bytes_per_chapter': raw_total / rows,
+        'compact_bytes': compact_total,
+        'compact_bytes_per_chapter': compact_total / rows,
+        'ratio': raw_total / compact_total if compact_total else None,
+        'interned_nicks': len(nick_table),
+        'compact_build_seconds': build_seconds,
+        'status_scan_ms_per_title': render_ms,
+    }
+
+def print_report(report):
+    mib = 1024 * 1024
+    print(f"Тайтлів: {report['titles']}; розділів у тайтлі: {report['chapters_per_title']}; колонок: {report['columns']}")
+    print(f"Списки рядків:  {report['raw_bytes'] / mib:9.1f} МіБ ({report['raw_bytes_per_chapter']:.0f} Б/розділ; "
+          f"виміряно на {report['raw_sample_titles']} тайтлах)")
+    print(f"TitleData:      {report['compact_bytes'] / mib:9.1f} МіБ ({report['compact_bytes_per_chapter']:.0f} Б/розділ)")
+    print(f"Економія: у {report['ratio']:.1f} раза; ніків у спільній таблиці: {report['interned_nicks']}")
+    print(f"Побудова TitleData: {report['compact_build_seconds']:.1f} с; обхід рядків для статусу: {report['status_scan_ms_per_title']:.1f} мс/тайтл")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Порівняння пам'яті: списки рядків проти компактних TitleData;")
+    parser.add_argument('--titles', type=int, default=500)
+    parser.add_argument('--chapters', type=int, default=1000)
+    parser.add_argument('--nicknames', type=int, default=60, help='кількість різних ніків у команді')
+    parser.add_argument('--raw-sample', type=int, default=20, help='на скількох тайтлах вимірювати списки рядків')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='зберегти результат у JSON-файл')
+    return parser.parse_args(argv)
+
+if __name__ == '__main__':
+    args = parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+    report = run(args)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
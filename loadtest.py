@@ -0,0 +1,675 @@
+"""
+Навантажувальний тест вебхука PustoBot;
+
+Надсилає синтетичні оновлення Telegram (/status; /updatestatus; /newchapter; /register та діалог /team)
+на маршрут webhook_handler із заданою частотою (RPS); Google Sheets замінено локальним фейковим
+сервером Sheets API v4; а Bot API — заглушкою на aiohttp; тож тест не торкається реальних сервісів;
+
+Звіт: p50/p95/p99 наскрізної затримки (від POST вебхука до відповіді бота та до результату з outbox);
+глибина черг у часі та кількість викликів Sheets на одне оновлення;
+
+Приклад: python loadtest.py --rps 20 --duration 30 --sheets-latency 0.15
+"""
+import argparse
+import asyncio
+import gzip
+import itertools
+import json
+import logging
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+import aiohttp
+from aiohttp import web
+from google.auth.credentials import AnonymousCredentials
+from requests.adapters import HTTPAdapter
+
+import main
+
+logger = logging.getLogger('loadtest')
+
+BOT_TOKEN = '123456:LOADTEST'
+SHEETS_API_URL = 'https://sheets.googleapis.com'
+DEFAULT_MIX = 'status=40,updatestatus=30,newchapter=10,register=10,team=10'
+ROLES = ['клін', 'переклад', 'тайп', 'редакт']
+# Скільки повідомлень бот надсилає у відповідь: підтвердження + результат з outbox для записів
+EXPECTED_REPLIES = {'status': 1, 'team': 1, 'updatestatus': 2, 'newchapter': 2, 'register': 2, 'team_input': 2}
+
+# --- Фейковий Google Sheets API v4 (підмножина; яку використовує gspread 5.12) ---
+
+def _column_number(letters):
+    number = 0
+    for char in letters:
+        number = number * 26 + ord(char) - 64
+    return number
+
+def parse_a1_range(range_name):
+    """'Тайтл'!A1:B2 -> (тайтл; рядок1; колонка1; рядок2; колонка2); None для відкритих меж;"""
+    title, _, cells = range_name.rpartition('!') if '!' in range_name else (range_name, '', '')
+    if title.startswith("'") and title.endswith("'"):
+        title = title[1:-1].replace("''", "'")
+    if not cells:
+        return title, 1, 1, None, None
+
+    def cell(ref):
+        match = re.fullmatch(r'([A-Z]*)(\d*)', ref)
+        return (int(match.group(2)) if match.group(2) else None), (_column_number(match.group(1)) if match.group(1) else None)
+
+    parts = cells.split(':')
+    row1, col1 = cell(parts[0])
+    row2, col2 = cell(parts[1]) if len(parts) > 1 else (row1, col1)
+    return title, row1 or 1, col1 or 1, row2, col2
+
+class FakeSheet:
+    """Один аркуш: рядки значень та властивості сітки;"""
+    def __init__(self, sheet_id, title, row_count, col_count, index):
+        self.id = sheet_id
+        self.title = title
+        self.rows = []
+        self.row_count = row_count
+        self.col_count = col_count
+        self.index = index
+        self.validations = []
+        self.conditional_formats = []
+
+    def properties(self):
+        return {'sheetId': self.id, 'title': self.title, 'index': self.index, 'sheetType': 'GRID',
+                'gridProperties': {'rowCount': self.row_count, 'columnCount': self.col_count}}
+
+    def _ensure(self, row, col):
+        while len(self.rows) < row:
+            self.rows.append([])
+        cells = self.rows[row - 1]
+        while len(cells) < col:
+            cells.append('')
+        self.row_count = max(self.row_count, len(self.rows))
+        self.col_count = max(self.col_count, col)
+
+    def read(self, row1, col1, row2, col2, major_dimension='ROWS'):
+        row2 = row2 or len(self.rows)
+        col2 = col2 or max((len(r) for r in self.rows), default=0)
+        values = []
+        for row in range(row1, row2 + 1):
+            cells = self.rows[row - 1] if row <= len(self.rows) else []
+            line = [cells[c - 1] if c <= len(cells) else '' for c in range(col1, col2 + 1)]
+            while line and line[-1] == '':
+                line.pop()
+            values.append(line)
+        if major_dimension == 'COLUMNS':
+            width = max((len(line) for line in values), default=0)
+            values = [[line[i] if i < len(line) else '' for line in values] for i in range(width)]
+            for line in values:
+                while line and line[-1] == '':
+                    line.pop()
+        while values and not values[-1]:
+            values.pop()
+        return values
+
+    def write(self, row1, col1, values, user_entered):
+        for i, line in enumerate(values):
+            self._ensure(row1 + i, col1 + len(line) - 1)
+            for j, value in enumerate(line):
+                value = '' if value is None else str(value)
+                # USER_ENTERED: апостроф лише примушує текстовий формат
+                if user_entered and value.startswith("'"):
+                    value = value[1:]
+                self.rows[row1 + i - 1][col1 + j - 1] = value
+
+    def is_empty(self, row):
+        return row > len(self.rows) or not any(self.rows[row - 1])
+
+class FakeSheetsBackend:
+    """Таблиці в пам'яті та облік запитів (виклики; з'єднання; байти);"""
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.spreadsheets = {} # ключ -> {sheetId -> FakeSheet}
+        self.lock = threading.RLock()
+        self.calls = Counter() # вид запиту -> кількість
+        self.connections = 0
+        self.bytes_sent = 0
+        self._next_sheet_id = 1
+
+    def total_calls(self):
+        with self.lock:
+            return sum(self.calls.values())
+
+    def _sheets(self, key):
+        return self.spreadsheets.setdefault(key, {})
+
+    def _by_title(self, key, title):
+        for sheet in self._sheets(key).values():
+            if sheet.title == title:
+                return sheet
+        raise KeyError(title)
+
+    def metadata(self, key, fields=None):
+        sheets = sorted(self._sheets(key).values(), key=lambda s: s.index)
+        if fields and 'conditionalFormats' not in fields:
+            return {'sheets': [{'properties': s.properties()} for s in sheets]}
+        return {
+            'spreadsheetId': key,
+            'properties': {'title': key, 'locale': 'uk_UA', 'timeZone': 'Europe/Kyiv'},
+            'sheets': [{'properties': s.properties(), 'conditionalFormats': s.conditional_formats} for s in sheets],
+            'spreadsheetUrl': f'http://fake/{key}',
+        }
+
+    def values_get(self, key, range_name, major_dimension='ROWS'):
+        title, row1, col1, row2, col2 = parse_a1_range(range_name)
+        values = self._by_title(key, title).read(row1, col1, row2, col2, major_dimension)
+        return {'range': range_name, 'majorDimension': major_dimension, 'values': values}
+
+    def values_update(self, key, range_name, values, user_entered):
+        title, row1, col1, _, _ = parse_a1_range(range_name)
+        self._by_title(key, title).write(row1, col1, values, user_entered)
+        return {'updatedRange': range_name, 'updatedRows': len(values)}
+
+    def values_append(self, key, range_name, values, user_entered):
+        title, row1, col1, _, _ = parse_a1_range(range_name)
+        sheet = self._by_title(key, title)
+        if '!' in range_name and sheet.is_empty(row1):
+            start = row1
+        else:
+            start = len(sheet.rows) + 1
+            while start > 1 and sheet.is_empty(start - 1):
+                start -= 1
+        sheet.write(start, col1, values, user_entered)
+        return {'updates': {'updatedRange': f'{title}!A{start}', 'updatedRows': len(values)}}
+
+    def batch_update(self, key, requests):
+        replies = []
+        for request in requests:
+            (kind, body), = request.items()
+            reply = {}
+            if kind == 'addSheet':
+                props = body.get('properties', {})
+                grid = props.get('gridProperties', {})
+                sheet = FakeSheet(self._next_sheet_id, props['title'], int(grid.get('rowCount', 100)),
+                                  int(grid.get('columnCount', 26)), len(self._sheets(key)))
+                self._next_sheet_id += 1
+                self._sheets(key)[sheet.id] = sheet
+                reply = {'addSheet': {'properties': sheet.properties()}}
+            elif kind in ('insertDimension', 'deleteDimension'):
+                dimension = body['range']
+                sheet = self._sheets(key)[dimension['sheetId']]
+                if dimension['dimension'] == 'ROWS':
+                    start, end = dimension['startIndex'], dimension['endIndex']
+                    if kind == 'insertDimension':
+                        while len(sheet.rows) < start:
+                            sheet.rows.append([])
+                        sheet.rows[start:start] = [[] for _ in range(end - start)]
+                        sheet.row_count += end - start
+                    else:
+                        del sheet.rows[start:end]
+                        sheet.row_count -= end - start
+            elif kind == 'setDataValidation':
+                self._sheets(key)[body['range']['sheetId']].validations.append(body)
+            elif kind == 'addConditionalFormatRule':
+                self._sheets(key)[body['rule']['ranges'][0]['sheetId']].conditional_formats.append(body['rule'])
+            elif kind == 'deleteConditionalFormatRule':
+                del self._sheets(key)[body['sheetId']].conditional_formats[body['index']]
+            replies.append(reply)
+        return {'spreadsheetId': key, 'replies': replies}
+
+def _call_kind(method, rest):
+    """Назва виклику API для звіту (без діапазонів та ключів);"""
+    if not rest:
+        return 'metadata'
+    if rest.startswith(':'):
+        return rest[1:]
+    if rest.startswith('/values:'):
+        return 'values' + rest[len('/values'):]
+    if rest.endswith(':append'):
+        return 'values:append'
+    return 'values.get' if method == 'GET' else 'values.update'
+
+def _make_sheets_handler(backend):
+    class SheetsRequestHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1' # keep-alive; як у справжнього API
+
+        def setup(self):
+            super().setup()
+            with backend.lock:
+                backend.connections += 1
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, code, payload):
+            data = json.dumps(payload).encode()
+            # Google стискає відповідь лише якщо User-Agent містить "gzip"
+            compress = 'gzip' in self.headers.get('Accept-Encoding', '') and 'gzip' in self.headers.get('User-Agent', '')
+            if compress:
+                data = gzip.compress(data)
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json; charset=UTF-8')
+            if compress:
+                self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            with backend.lock:
+                backend.bytes_sent += len(data)
+
+        def _error(self, code, message, status):
+            self._send(code, {'error': {'code': code, 'message': message, 'status': status}})
+
+        def _route(self, method):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            length = int(self.headers.get('Content-Length') or 0)
+            body = json.loads(self.rfile.read(length)) if length else {}
+            match = re.match(r'^/v4/spreadsheets/([^/:]+)(.*)$', url.path)
+            if not match:
+                return self._error(404, 'not found', 'NOT_FOUND')
+            key, rest = match.group(1), unquote(match.group(2))
+            with backend.lock:
+                backend.calls[_call_kind(method, rest)] += 1
+            if backend.latency:
+                time.sleep(backend.latency)
+
+            user_entered = query.get('valueInputOption', [''])[0] == 'USER_ENTERED'
+            major_dimension = query.get('majorDimension', ['ROWS'])[0]
+            try:
+                with backend.lock:
+                    if rest == '' and method == 'GET':
+                        return self._send(200, backend.metadata(key, query.get('fields', [None])[0]))
+                    if rest == ':batchUpdate':
+                        return self._send(200, backend.batch_update(key, body['requests']))
+                    if rest == '/values:batchGet':
+                        ranges = [backend.values_get(key, r, major_dimension) for r in query.get('ranges', [])]
+                        return self._send(200, {'spreadsheetId': key, 'valueRanges': ranges})
+                    if rest == '/values:batchUpdate':
+                        user_entered = body.get('valueInputOption') == 'USER_ENTERED'
+                        for data in body.get('data', []):
+                            backend.values_update(key, data['range'], data['values'], user_entered)
+                        return self._send(200, {'spreadsheetId': key, 'totalUpdatedRows': len(body.get('data', []))})
+                    if rest.startswith('/values/'):
+                        range_name = rest[len('/values/'):]
+                        if range_name.endswith(':append'):
+                            return self._send(200, backend.values_append(key, range_name[:-len(':append')], body.get('values', []), user_entered))
+                        if method == 'GET':
+                            return self._send(200, backend.values_get(key, range_name, major_dimension))
+                        if method == 'PUT':
+                            return self._send(200, backend.values_update(key, range_name, body.get('values', []), user_entered))
+            except KeyError as e:
+                return self._error(400, f'Unable to parse range: {e}', 'INVALID_ARGUMENT')
+            return self._error(404, 'not found', 'NOT_FOUND')
+
+        def do_GET(self):
+            self._route('GET')
+
+        def do_POST(self):
+            self._route('POST')
+
+        def do_PUT(self):
+            self._route('PUT')
+
+    return SheetsRequestHandler
+
+def serve_fake_sheets(backend):
+    """Запускає фейковий Sheets API у фоновому потоці; повертає сервер (порт у server_port);"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _make_sheets_handler(backend))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+class _RedirectAdapter(HTTPAdapter):
+    """Перенаправляє запити gspread з sheets.googleapis.com на локальний фейковий сервер;"""
+    def __init__(self, base_url, **kwargs):
+        self.base_url = base_url
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        request.url = request.url.replace(SHEETS_API_URL, self.base_url, 1)
+        return super().send(request, **kwargs)
+
+def fake_sheets_helper_class(base_url):
+    """SheetsHelper; що ходить на фейковий сервер (той самий клієнт; пул та таймаути; що й у продакшні);"""
+    class FakeSheetsHelper(main.SheetsHelper):
+        def _build_client(self):
+            client = main.build_sheets_client(AnonymousCredentials())
+            client.session.mount(SHEETS_API_URL, _RedirectAdapter(base_url, pool_maxsize=main.SHEETS_POOL_SIZE))
+            return client
+    return FakeSheetsHelper
+
+# --- Заглушка Telegram Bot API ---
+
+class BotApiStub:
+    """Відповідає на виклики Bot API та фіксує час кожного повідомлення бота;"""
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.on_message = None # callback(chat_id; text; час)
+        self.calls = Counter()
+        self._message_ids = itertools.count(1)
+
+    async def handle(self, request):
+        method = request.match_info['method']
+        self.calls[method] += 1
+        if request.content_type == 'application/json':
+            params = await request.json()
+        else:
+            params = dict(await request.post())
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if method == 'getMe':
+            result = {'id': int(BOT_TOKEN.split(':')[0]), 'is_bot': True, 'first_name': 'PustoBot', 'username': 'pustobot'}
+        elif method in ('sendMessage', 'sendDocument'):
+            chat_id = int(params['chat_id'])
+            if self.on_message:
+                self.on_message(chat_id, params.get('text', ''), time.perf_counter())
+            result = {'message_id': next(self._message_ids), 'date': int(time.time()),
+                      'chat': {'id': chat_id, 'type': 'private'}, 'text': params.get('text', '')}
+        else:
+            result = True
+        return web.json_response({'ok': True, 'result': result})
+
+    def web_app(self):
+        app = web.Application()
+        app.add_routes([web.post('/bot{token}/{method}', self.handle)])
+        return app
+
+# --- Генератор оновлень ---
+
+class SentUpdate:
+    """Одне надіслане оновлення та відповіді бота на нього;"""
+    __slots__ = ('kind', 'sent_at', 'webhook_ms', 'replies', 'expected', 'done')
+
+    def __init__(self, kind, expected):
+        self.kind = kind
+        self.sent_at = None
+        self.webhook_ms = None
+        self.replies = []
+        self.expected = expected
+        self.done = asyncio.Event()
+
+class UpdateFactory:
+    """Створює JSON оновлень; схожих на справжні (команди з entity bot_command; приватні чати);"""
+    def __init__(self, titles, chapters, users, rng):
+        self.titles = titles
+        self.next_chapter = {title: chapters + 1 for title in titles}
+        self.chapters = chapters
+        self.users = users
+        self.rng = rng
+        self._ids = itertools.count(1)
+
+    def message(self, user_id, text):
+        """Повертає (chat_id; JSON оновлення); кожне оновлення має власний чат для зіставлення відповідей;"""
+        update_id = next(self._ids)
+        chat_id = 10 ** 9 + update_id
+        message = {
+            'message_id': update_id, 'date': int(time.time()), 'text': text,
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': f'Tester{user_id}', 'username': f'tester{user_id}'},
+        }
+        if text.startswith('/'):
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+        return chat_id, {'update_id': update_id, 'message': message}
+
+    def command(self, kind):
+        """Текст команди для виду навантаження (крім діалогу /team);"""
+        title = self.rng.choice(self.titles)
+        if kind == 'status':
+            if self.rng.random() < 0.5:
+                start = self.rng.randint(1, self.chapters)
+                return f'/status "{title}" {start}-{min(start + 9, self.chapters)}'
+            return f'/status "{title}"'
+        if kind == 'updatestatus':
+            chapter = self.rng.randint(1, self.chapters)
+            return f'/updatestatus "{title}" {chapter} {self.rng.choice(ROLES)} {self.rng.choice("+-")}'
+        if kind == 'newchapter':
+            chapter = self.next_chapter[title]
+            self.next_chapter[title] += 1
+            return f'/newchapter "{title}" {chapter}'
+        if kind == 'register':
+            return f'/register Tester {self.rng.randint(1, 10 ** 6)}'
+        raise ValueError(kind)
+
+def parse_mix(mix):
+    """'status=40;...' (через кому) -> (види; ваги);"""
+    weights = {}
+    for part in mix.split(','):
+        kind, _, weight = part.partition('=')
+        if kind.strip() not in ('status', 'updatestatus', 'newchapter', 'register', 'team'):
+            raise ValueError(f'Невідомий вид оновлення: {kind}')
+        weights[kind.strip()] = float(weight or 1)
+    return list(weights), list(weights.values())
+
+def percentile(values, pct):
+    """Перцентиль методом найближчого рангу;"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+class LoadTest:
+    """Піднімає бот із фейковими Sheets та Bot API і подає на вебхук навантаження з відкритим циклом;"""
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.kinds, self.weights = parse_mix(args.mix)
+        self.sent = []
+        self.by_chat = {} # chat_id -> SentUpdate
+        self.samples = [] # (секунда; черга оновлень; outbox; очікують відповіді)
+        self.tasks = set()
+
+    def _on_bot_message(self, chat_id, text, at):
+        record = self.by_chat.get(chat_id)
+        if record is None:
+            return
+        record.replies.append(at)
+        if len(record.replies) >= record.expected:
+            record.done.set()
+
+    async def _post(self, session, kind, chat_id, payload):
+        record = SentUpdate(kind, EXPECTED_REPLIES[kind])
+        self.by_chat[chat_id] = record
+        self.sent.append(record)
+        record.sent_at = time.perf_counter()
+        async with session.post(self.webhook_url, json=payload) as response:
+            await response.read()
+        record.webhook_ms = (time.perf_counter() - record.sent_at) * 1000
+        return record
+
+    async def _scenario(self, session, kind, user_id):
+        if kind != 'team':
+            chat_id, payload = self.factory.message(user_id, self.factory.command(kind))
+            await self._post(session, kind, chat_id, payload)
+            return
+        # Діалог /team: друге повідомлення лише після запитання бота
+        title = self.rng.choice(self.factory.titles)
+        chat_id, payload = self.factory.message(user_id, f'/team "{title}"')
+        record = await self._post(session, 'team', chat_id, payload)
+        try:
+            await asyncio.wait_for(record.done.wait(), timeout=self.args.drain_timeout)
+        except asyncio.TimeoutError:
+            return
+        team = '; '.join(f'{role} - nick{self.rng.randint(1, 50)}' for role in ROLES)
+        chat_id, payload = self.factory.message(user_id, team)
+        await self._post(session, 'team_input', chat_id, payload)
+
+    async def _sample_queues(self, started):
+        while True:
+            waiting = sum(1 for record in self.sent if not record.done.is_set())
+            self.samples.append((time.perf_counter() - started, self.bot_app.update_queue.qsize(),
+                                 len(self.outbox.pending()), waiting))
+            await asyncio.sleep(self.args.sample_interval)
+
+    async def _seed(self, sheets):
+        """Підготовка даних (не враховується у звіті): тайтли з командами та розділами; зареєстровані користувачі;"""
+        for title in self.factory.titles:
+            team = '; '.join(f'{role} - nick{i}' for i, role in enumerate(ROLES))
+            await asyncio.to_thread(sheets.set_team, title, team, '', '@seed', 'seed')
+            await asyncio.to_thread(sheets.add_chapters, title, list(range(1, self.args.chapters + 1)), '@seed', 'seed')
+        for user_id in self.factory.users:
+            await asyncio.to_thread(sheets.register_user, user_id, f'@tester{user_id}', f'Tester {user_id}')
+
+    async def run(self):
+        args = self.args
+        workdir = tempfile.mkdtemp(prefix='pustobot-loadtest-')
+
+        # Фейковий Sheets API
+        self.backend = FakeSheetsBackend(latency=args.sheets_latency)
+        sheets_server = serve_fake_sheets(self.backend)
+        helper_class = fake_sheets_helper_class(f'http://127.0.0.1:{sheets_server.server_port}')
+
+        # Заглушка Bot API
+        self.stub = BotApiStub(latency=args.bot_latency)
+        self.stub.on_message = self._on_bot_message
+        stub_runner = web.AppRunner(self.stub.web_app())
+        await stub_runner.setup()
+        await web.TCPSite(stub_runner, '127.0.0.1', 0).start()
+        stub_port = stub_runner.addresses[0][1]
+
+        titles = [f'Тайтл {i}' for i in range(1, args.titles + 1)]
+        users = list(range(1000, 1000 + args.users))
+        self.factory = UpdateFactory(titles, args.chapters, users, self.rng)
+
+        # Бот: ті самі Application; обробники; outbox-воркер та маршрут вебхука; що й у run_bot
+        self.outbox = main.SheetsOutbox(os.path.join(workdir, 'outbox.jsonl'))
+        sheets = helper_class(None, 'loadtest', outbox=self.outbox, shard_keys=args.shards)
+        await self._seed(sheets)
+        self.bot_app = main.build_application(BOT_TOKEN, persistence=False, base_url=f'http://127.0.0.1:{stub_port}/bot')
+        worker = await main.start_application(self.bot_app, sheets, self.outbox)
+        webhook_path = '/' + BOT_TOKEN
+        web_runner = web.AppRunner(main.build_web_app(self.bot_app, webhook_path))
+        await web_runner.setup()
+        await web.TCPSite(web_runner, '127.0.0.1', 0).start()
+        self.webhook_url = f'http://127.0.0.1:{web_runner.addresses[0][1]}{webhook_path}'
+
+        calls_before = self.backend.total_calls()
+        breakdown_before = Counter(self.backend.calls)
+        started = time.perf_counter()
+        sampler = asyncio.create_task(self._sample_queues(started))
+        total = int(args.rps * args.duration)
+        team_users = itertools.count(10 ** 6) # окремий користувач на кожен діалог /team
+
+        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0)) as session:
+            # Відкритий цикл: нові оновлення надходять за розкладом; незалежно від швидкості бота
+            for i in range(total):
+                delay = started + i / args.rps - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                kind = self.rng.choices(self.kinds, self.weights)[0]
+                user_id = next(team_users) if kind == 'team' else self.rng.choice(users)
+                task = asyncio.create_task(self._scenario(session, kind, user_id))
+                self.tasks.add(task)
+                task.add_done_callback(self.tasks.discard)
+
+            # Очікуємо; доки бот розбере черги
+            deadline = time.perf_counter() + args.drain_timeout
+            while (self.tasks or any(not r.done.is_set() for r in self.sent)) and time.perf_counter() < deadline:
+                await asyncio.sleep(0.1)
+            finished = time.perf_counter()
+
+        sampler.cancel()
+        worker.cancel()
+        await self.bot_app.stop()
+        await self.bot_app.shutdown()
+        await web_runner.cleanup()
+        await stub_runner.cleanup()
+        sheets_server.shutdown()
+
+        breakdown = Counter(self.backend.calls)
+        breakdown.subtract(breakdown_before)
+        return self.report(self.backend.total_calls() - calls_before, +breakdown, finished - started)
+
+    def report(self, sheets_calls, breakdown, total_seconds):
+        """Збирає звіт (dict): затримки за видами; черги в часі; виклики Sheets;"""
+        def stats(values):
+            return {'count': len(values), 'p50': percentile(values, 50), 'p95': percentile(values, 95),
+                    'p99': percentile(values, 99), 'max': max(values) if values else None}
+
+        reply_ms, applied_ms = {}, {}
+        for record in self.sent:
+            if record.replies:
+                reply_ms.setdefault(record.kind, []).append((record.replies[0] - record.sent_at) * 1000)
+            if record.expected > 1 and len(record.replies) >= record.expected:
+                applied_ms.setdefault(record.kind, []).append((record.replies[-1] - record.sent_at) * 1000)
+
+        completed = sum(1 for record in self.sent if record.done.is_set())
+        return {
+            'config': {k: v for k, v in vars(self.args).items() if k != 'json'},
+            'updates_sent': len(self.sent),
+            'updates_completed': completed,
+            'offered_rps': len(self.sent) / self.args.duration,
+            'completed_rps': completed / total_seconds if total_seconds else None,
+            'webhook_ms': stats([r.webhook_ms for r in self.sent if r.webhook_ms is not None]),
+            'reply_ms': {'all': stats([v for values in reply_ms.values() for v in values]),
+                         **{kind: stats(values) for kind, values in sorted(reply_ms.items())}},
+            'applied_ms': {kind: stats(values) for kind, values in sorted(applied_ms.items())},
+            'sheets_calls': sheets_calls,
+            'sheets_calls_per_update': sheets_calls / len(self.sent) if self.sent else None,
+            'sheets_calls_by_kind': dict(breakdown.most_common()),
+            'sheets_connections': self.backend.connections,
+            'bot_api_calls': dict(self.stub.calls),
+            'queue_depth': [{'t': round(t, 2), 'update_queue': q, 'outbox': o, 'awaiting_reply': w} for t, q, o, w in self.samples],
+        }
+
+def print_report(report):
+    """Текстовий звіт у stdout;"""
+    def row(name, s):
+        if not s or not s['count']:
+            return f'  {name:<14} —'
+        return f"  {name:<14} n={s['count']:<6} p50={s['p50']:8.1f}  p95={s['p95']:8.1f}  p99={s['p99']:8.1f}  max={s['max']:8.1f}"
+
+    print(f"Надіслано оновлень: {report['updates_sent']}; завершено: {report['updates_completed']}")
+    print(f"Запропоновано: {report['offered_rps']:.1f} RPS; оброблено: {report['completed_rps']:.1f} RPS")
+    print('\nPOST вебхука (мс):')
+    print(row('webhook', report['webhook_ms']))
+    print('\nДо першої відповіді бота (мс):')
+    for kind, s in report['reply_ms'].items():
+        print(row(kind, s))
+    print('\nДо результату з outbox (мс):')
+    for kind, s in report['applied_ms'].items():
+        print(row(kind, s))
+    print(f"\nВиклики Sheets: {report['sheets_calls']} ({report['sheets_calls_per_update']:.2f} на оновлення); з'єднань: {report['sheets_connections']}")
+    for kind, count in report['sheets_calls_by_kind'].items():
+        print(f'  {kind:<24} {count}')
+
+    print('\nГлибина черг (с; update_queue; outbox; очікують відповіді):')
+    samples = report['queue_depth']
+    step = max(1, len(samples) // 30)
+    for sample in samples[::step]:
+        print(f"  {sample['t']:7.1f}  {sample['update_queue']:6}  {sample['outbox']:6}  {sample['awaiting_reply']:6}")
+    if samples:
+        print(f"  макс: update_queue={max(s['update_queue'] for s in samples)}; outbox={max(s['outbox'] for s in samples)}; "
+              f"очікують={max(s['awaiting_reply'] for s in samples)}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Навантажувальний тест вебхука PustoBot з фейковими Sheets та Bot API;')
+    parser.add_argument('--rps', type=float, default=10, help='частота оновлень на вебхук')
+    parser.add_argument('--duration', type=float, default=30, help='тривалість генерації; с')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'ваги видів оновлень (типово: {DEFAULT_MIX})')
+    parser.add_argument('--titles', type=int, default=20, help='кількість тайтлів у фейковій таблиці')
+    parser.add_argument('--chapters', type=int, default=50, help='розділів у кожному тайтлі')
+    parser.add_argument('--users', type=int, default=50, help='зареєстрованих користувачів')
+    parser.add_argument('--shards', default='', help='додаткові ключі таблиць-шардів через кому')
+    parser.add_argument('--sheets-latency', type=float, default=0.15, help='затримка кожного запиту до Sheets; с')
+    parser.add_argument('--bot-latency', type=float, default=0.0, help='затримка кожного виклику Bot API; с')
+    parser.add_argument('--sample-interval', type=float, default=0.5, help='інтервал вимірювання черг; с')
+    parser.add_argument('--drain-timeout', type=float, default=60, help='скільки чекати відповідей після генерації; с')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='зберегти повний звіт у JSON-файл')
+    args = parser.parse_args(argv)
+    args.shards = [key.strip() for key in args.shards.split(',') if key.strip()]
+    return args
+
+if __name__ == '__main__':
+    args = parse_args()
+    # Логи кожного запиту бота спотворили б виміри
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+    report = asyncio.run(LoadTest(args).run())
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
@@ -4,18 +4,84 @@ import logging
 import re
 import gspread
 import asyncio
+import bisect
+import contextvars
+import csv
+import difflib
+import functools
+import io
+import json
+import math
 import os
 import sys
+import pickle
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+from array import array
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote
+import requests
 from aiohttp import web
-from telegram import Update
-from telegram.ext import ApplicationBuilder, CommandHandler, ContextTypes, MessageHandler, filters
-from datetime import datetime
+from telegram import InlineQueryResultArticle, InputTextMessageContent, Update
+from telegram.request import HTTPXRequest
+from telegram.ext import (
+    Application, ApplicationBuilder, BasePersistence, CommandHandler, ContextTypes, InlineQueryHandler, MessageHandler, PersistenceInput,
+    PicklePersistence, filters,
+)
+from copy import deepcopy
+from datetime import date, datetime, time as dt_time
 import gspread.utils
+import google.auth.exceptions
+from google.auth.transport.requests import AuthorizedSession
+from google.oauth2.service_account import Credentials as ServiceAccountCredentials
+from requests.adapters import HTTPAdapter
+
+try:
+    # Необов'язкова залежність: експорт у XLSX (/export ... xlsx)
+    from openpyxl import Workbook
+except ImportError:
+    Workbook = None
+
+try:
+    # Необов'язкова залежність: спільне сховище стану для кількох реплік бота
+    import redis.asyncio as redis_asyncio
+except ImportError:
+    redis_asyncio = None
 
 TELEGRAM_BOT_TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN")
 WEBHOOK_URL = os.environ.get("WEBHOOK_URL")
 GOOGLE_CREDENTIALS_FILE = os.environ.get("GOOGLE_CREDENTIALS_FILE", 'credentials.json')
 SPREADSHEET_KEY = os.environ.get("SPREADSHEET_KEY")
+# Додаткові таблиці (шарди) для аркушів тайтлів; через кому; основна таблиця SPREADSHEET_KEY теж є шардом
+SPREADSHEET_SHARD_KEYS = [k.strip() for k in os.environ.get("SPREADSHEET_SHARD_KEYS", '').split(',') if k.strip()]
+# Локальний журнал запланованих змін (outbox) та інтервал повторних спроб
+OUTBOX_FILE = os.environ.get("OUTBOX_FILE", 'outbox.jsonl')
+OUTBOX_RETRY_SECONDS = float(os.environ.get("OUTBOX_RETRY_SECONDS", 30))
+# HTTP-транспорт Google Sheets: розмір пулу keep-alive з'єднань та тайм-аути (з'єднання; читання) у секундах
+SHEETS_POOL_SIZE = int(os.environ.get("SHEETS_POOL_SIZE", 10))
+SHEETS_CONNECT_TIMEOUT = float(os.environ.get("SHEETS_CONNECT_TIMEOUT", 5))
+SHEETS_WRITE_TIMEOUT = float(os.environ.get("SHEETS_WRITE_TIMEOUT", 20))
+SHEETS_READ_TIMEOUT = float(os.environ.get("SHEETS_READ_TIMEOUT", 60)) # Великі get_all_values читаються довше
+# Збереження стану розмов (user/chat/bot data): файл локально або Redis (REDIS_URL) для кількох реплік
+PERSISTENCE_FILE = os.environ.get("PERSISTENCE_FILE", 'bot_state.pickle')
+PERSISTENCE_UPDATE_INTERVAL = float(os.environ.get("PERSISTENCE_UPDATE_INTERVAL", 1))
+REDIS_URL = os.environ.get("REDIS_URL")
+# Знімок in-memory кешу (карта аркушів; користувачі; дані тайтлів) для теплого старту: файл (порожньо — вимкнено);
+# інтервал збереження (с) та максимальний вік даних (с); з яким відповіді ще беруться зі знімка до фонової перевірки
+CACHE_SNAPSHOT_FILE = os.environ.get("CACHE_SNAPSHOT_FILE", 'sheets_cache.pickle')
+CACHE_SNAPSHOT_INTERVAL = float(os.environ.get("CACHE_SNAPSHOT_INTERVAL", 300))
+CACHE_SNAPSHOT_MAX_AGE = float(os.environ.get("CACHE_SNAPSHOT_MAX_AGE", 24 * 3600))
+CACHE_SNAPSHOT_VERSION = 1
+REDIS_PREFIX = os.environ.get("REDIS_PREFIX", 'pustobot')
+# Скільки секунд пам'ятати update_id для відкидання повторних доставок
+UPDATE_DEDUP_TTL = int(os.environ.get("UPDATE_DEDUP_TTL", 3600))
+# Трасування оновлень (спани по кроках) та поріг (мс від надходження оновлення) для журналу повільних операцій
+TRACE_UPDATES = os.environ.get("TRACE_UPDATES", '').lower() in ('1', 'true', 'yes')
+TRACE_SLOW_MS = float(os.environ.get("TRACE_SLOW_MS", 5000))
 
 # Налаштування логування
 logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
@@ -50,47 +116,1013 @@ def generate_sheet_headers(include_beta=False):
 # Використовуємо стандартні заголовки без бети як глобальний дефолт
 SHEET_HEADERS = generate_sheet_headers(include_beta=False)
 
+# Суфікси колонок ролі в рядку заголовків (порядок відповідає SheetSchema.roles)
+ROLE_COLUMN_SUFFIXES = ('-Нік', '-Дата', '-Статус')
+
+# Допустимі значення колонок '-Статус' (випадний список) та їх кольори (умовне форматування)
+STATUS_VALUES = ('✅', '❌')
+STATUS_COLORS = {
+    '✅': {'red': 0.85, 'green': 0.94, 'blue': 0.83},
+    '❌': {'red': 0.96, 'green': 0.80, 'blue': 0.80},
+}
+# Перший рядок з розділами (0-based; рядки 1-3 — назва; команда; заголовки)
+FIRST_DATA_ROW_INDEX = 3
+# Маска полів: лише діапазони та умови правил умовного форматування (щоб знайти правила статусів)
+CONDITIONAL_FORMATS_FIELDS = "sheets(properties(sheetId),conditionalFormats(ranges,booleanRule(condition)))"
+
+def status_columns(headers):
+    """Межі колонок '-Статус' (0-based; [початок; кінець));"""
+    return [(i, i + 1) for i, header in enumerate(headers) if header.endswith('-Статус')]
+
+def is_status_format_rule(rule):
+    """Чи є правило умовного форматування правилом бота для колонок статусу;"""
+    condition = rule.get('booleanRule', {}).get('condition', {})
+    values = [value.get('userEnteredValue') for value in condition.get('values', [])]
+    return condition.get('type') == 'TEXT_EQ' and len(values) == 1 and values[0] in STATUS_VALUES
+
+def status_validation_requests(sheet_id, headers, stale_rule_indexes=(), stale_columns=()):
+    """
+    Запити batch_update: випадний список ✅/❌ та кольори для всіх колонок '-Статус';
+    Старі правила бота (stale_rule_indexes) знімаються в тому ж пакеті; валідація знімається лише з колонок
+    попереднього розташування (stale_columns: (start; end) з діапазонів старих правил); інші колонки не чіпаються;
+    """
+    status_ranges = [
+        {'sheetId': sheet_id, 'startRowIndex': FIRST_DATA_ROW_INDEX, 'startColumnIndex': start, 'endColumnIndex': end}
+        for start, end in status_columns(headers)
+    ]
+    # Індекси видаляються від більшого до меншого; щоб не зсувати ще не видалені
+    requests = [
+        {'deleteConditionalFormatRule': {'sheetId': sheet_id, 'index': index}}
+        for index in sorted(stale_rule_indexes, reverse=True)
+    ]
+    current_columns = set(status_columns(headers))
+    requests.extend(
+        {'setDataValidation': {'range': {
+            'sheetId': sheet_id, 'startRowIndex': FIRST_DATA_ROW_INDEX, 'startColumnIndex': start, 'endColumnIndex': end,
+        }}}
+        for start, end in sorted(set(stale_columns) - current_columns)
+    )
+    rule = {
+        'condition': {'type': 'ONE_OF_LIST', 'values': [{'userEnteredValue': value} for value in STATUS_VALUES]},
+        'strict': True,
+        'showCustomUi': True,
+    }
+    requests.extend({'setDataValidation': {'range': status_range, 'rule': rule}} for status_range in status_ranges)
+    requests.extend(
+        {'addConditionalFormatRule': {'index': 0, 'rule': {
+            'ranges': status_ranges,
+            'booleanRule': {
+                'condition': {'type': 'TEXT_EQ', 'values': [{'userEnteredValue': value}]},
+                'format': {'backgroundColor': color},
+            },
+        }}}
+        for value, color in STATUS_COLORS.items()
+    )
+    return requests
+
+def team_has_beta(team_string):
+    """Чи є бета-роль у рядку команди (клітинка A2);"""
+    return 'бета -' in (team_string or '').lower()
+
+def format_chapter_log(chapters):
+    """Розділи для журналу: номер або діапазон min-max з кількістю;"""
+    if len(chapters) == 1:
+        return str(chapters[0])
+    # При логуванні діапазону для дробових номерів беремо min/max
+    try:
+        # Конвертуємо в float для сортування (для коректного min/max дробових)
+        sorted_chapters = sorted([float(c) for c in chapters])
+        first = sorted_chapters[0]
+        last = sorted_chapters[-1]
+        
+        # Форматуємо назад в рядок (без зайвих .0)
+        str_first = str(first) if '.' in str(first) else str(int(first))
+        str_last = str(last) if '.' in str(last) else str(int(last))
+        
+        return f"{str_first}-{str_last} ({len(chapters)} шт;)"
+    except ValueError:
+        # Якщо є нечислові значення; просто логуємо кількість
+        return f"({len(chapters)} шт;)"
+
+class SheetSchema:
+    """
+    Скомпільована схема колонок аркуша тайтлу (рядок 3);
+    roles: роль -> (індекс Нік; індекс Дата; індекс Статус); 0-based; None якщо колонки немає;
+    version збільшується при кожній перекомпіляції (коли заголовки змінилися);
+    """
+    __slots__ = ('headers', 'version', 'roles', 'has_beta')
+
+    def __init__(self, headers, version=1):
+        self.headers = tuple(headers)
+        self.version = version
+        roles = {}
+        for index, header in enumerate(self.headers):
+            for position, suffix in enumerate(ROLE_COLUMN_SUFFIXES):
+                if header.endswith(suffix):
+                    roles.setdefault(header[:-len(suffix)], [None, None, None])[position] = index
+        self.roles = {role: tuple(columns) for role, columns in roles.items()}
+        self.has_beta = 'Бета' in self.roles
+
+    def matches(self, headers):
+        return self.headers == tuple(headers)
+
+    def columns(self, role):
+        """(Нік; Дата; Статус) для ролі або None;"""
+        return self.roles.get(role)
+
+    def new_chapter_row(self, chapter_number):
+        """Рядок нового розділу: номер; порожні Нік/Дата та '❌' у кожній колонці Статусу;"""
+        row = [''] * len(self.headers)
+        # Одинарна лапка запобігає конвертації номера в дату
+        row[0] = f"'{chapter_number}"
+        for _, _, status_index in self.roles.values():
+            if status_index is not None:
+                row[status_index] = '❌'
+        return row
+
+# Коди статусів у TitleData (2 біти на роль): порожньо; ✅; ❌; інше значення
+STATUS_CODES = {'': 0, '✅': 1, '❌': 2}
+STATUS_OTHER = 3
+STATUS_DISPLAY = {1: '✅', 2: '❌'}
+STATUS_BITS = 2
+# Дати ролей зберігаються як кількість днів від цієї дати (0 — дати немає)
+DATE_EPOCH_ORDINAL = date(2000, 1, 1).toordinal() - 1
+# Вид підпису розділу: як ціле ('12'); як str(float) ('20.5'); інше (зберігається окремо)
+LABEL_INT, LABEL_FLOAT, LABEL_OTHER = 0, 1, 2
+
+class StringTable:
+    """Спільна таблиця рядків (ніків): кожен рядок зберігається один раз; у даних лише його номер (0 — порожньо);"""
+    __slots__ = ('_ids', '_strings', '_lock')
+
+    def __init__(self):
+        self._ids = {'': 0}
+        self._strings = ['']
+        self._lock = threading.Lock()
+
+    def intern(self, value):
+        string_id = self._ids.get(value)
+        if string_id is None:
+            with self._lock:
+                string_id = self._ids.get(value)
+                if string_id is None:
+                    string_id = len(self._strings)
+                    self._strings.append(value)
+                    self._ids[value] = string_id
+        return string_id
+
+    def __getitem__(self, string_id):
+        return self._strings[string_id]
+
+    def __len__(self):
+        return len(self._strings)
+
+def values_fingerprint(values):
+    """Відбиток вмісту аркуша (CRC32 усіх клітинок): незмінений аркуш не розбирається повторно;"""
+    crc = 0
+    for row in values:
+        crc = zlib.crc32('\x1f'.join(row).encode() + b'\x1e', crc)
+    return crc
+
+class TitleData:
+    """
+    Компактні in-memory дані тайтлу (замість списків рядків з get_all_values):
+    номери розділів — масив чисел; статуси ролей рядка — одна бітова маска; ніки — номери у спільній StringTable;
+    дати — кількість днів (масив; по одній на роль); рядки читаються через ChapterRow;
+    """
+    __slots__ = ('schema', 'team', 'fetched_at', 'fingerprint', 'roles', 'nick_table', 'numbers', 'label_kinds', 'other_labels',
+                 'statuses', 'nicks', 'dates')
+
+    def __init__(self, schema, team, nick_table, fetched_at, fingerprint=None):
+        self.schema = schema
+        self.team = team
+        self.fetched_at = fetched_at
+        self.fingerprint = fingerprint # values_fingerprint аркуша; з якого побудовано дані
+        self.roles = tuple(schema.roles) # Порядок ролей = порядок колонок
+        self.nick_table = nick_table
+        self.numbers = array('d') # Номер розділу (NaN для нечислових)
+        self.label_kinds = array('B')
+        self.other_labels = {} # індекс рядка -> підпис; що не відновлюється з числа
+        self.statuses = array('I') # STATUS_BITS біт на роль
+        self.nicks = array('I') # рядок * кількість ролей + роль -> номер у nick_table
+        self.dates = array('H') # так само -> днів від DATE_EPOCH_ORDINAL
+
+    @classmethod
+    def from_values(cls, values, schema, nick_table, fetched_at=None, fingerprint=None):
+        """Будує дані з результату get_all_values (рядок 2 — команда; рядок 3 — заголовки; далі розділи);"""
+        team = values[1][0] if len(values) > 1 and values[1] else ''
+        if fingerprint is None:
+            fingerprint = values_fingerprint(values)
+        data = cls(schema, team, nick_table, fetched_at or time.time(), fingerprint)
+        columns = list(schema.roles.values())
+        intern = nick_table.intern
+        date_days = {'': 0} # Текст дати -> днів (дати в аркуші здебільшого повторюються)
+        for row in values[3:]:
+            label = row[0].strip().lstrip("'") if row else ''
+            if not label:
+                continue
+            index = len(data.numbers)
+            try:
+                number = float(label)
+            except ValueError:
+                number = float('nan')
+            if not math.isfinite(number):
+                number = float('nan') # inf; Infinity; 1e999 — текстові мітки; int() для них не працює
+            if '.' not in label and number == number and label == str(int(number)):
+                data.label_kinds.append(LABEL_INT)
+            elif label == str(number):
+                data.label_kinds.append(LABEL_FLOAT)
+            else:
+                data.label_kinds.append(LABEL_OTHER)
+                data.other_labels[index] = label
+            data.numbers.append(number)
+
+            mask = 0
+            for position, (nick_index, date_index, status_index) in enumerate(columns):
+                status_char = row[status_index] if status_index is not None and status_index < len(row) else ''
+                mask |= STATUS_CODES.get(status_char, STATUS_OTHER) << (position * STATUS_BITS)
+                nick = row[nick_index].strip() if nick_index is not None and nick_index < len(row) else ''
+                data.nicks.append(intern(nick))
+                date_text = row[date_index] if date_index is not None and date_index < len(row) else ''
+                days = date_days.get(date_text)
+                if days is None:
+                    role_date = parse_sheet_date(date_text)
+                    days = role_date.toordinal() - DATE_EPOCH_ORDINAL if role_date else 0
+                    days = date_days[date_text] = days if 0 < days < 1 << 16 else 0
+                data.dates.append(days)
+            data.statuses.append(mask)
+        return data
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def label(self, index):
+        kind = self.label_kinds[index]
+        if kind == LABEL_INT:
+            return str(int(self.numbers[index]))
+        if kind == LABEL_FLOAT:
+            return str(self.numbers[index])
+        return self.other_labels[index]
+
+    def rows(self):
+        for index in range(len(self.numbers)):
+            yield ChapterRow(self, index)
+
+    def to_snapshot(self):
+        """Кортеж для знімка кешу: масиви як байти; ніки — номери в nick_table (таблиця зберігається окремо);"""
+        return (self.schema.headers, self.team, self.fetched_at, self.fingerprint, self.numbers.tobytes(),
+                self.label_kinds.tobytes(), self.other_labels, self.statuses.tobytes(), self.nicks.tobytes(), self.dates.tobytes())
+
+    @classmethod
+    def from_snapshot(cls, state, schema, nick_table, nick_ids):
+        """Відновлює дані зі знімка; nick_ids: номер ніка у знімку -> номер у nick_table;"""
+        _, team, fetched_at, fingerprint, numbers, label_kinds, other_labels, statuses, nicks, dates = state
+        data = cls(schema, team, nick_table, fetched_at, fingerprint)
+        data.numbers.frombytes(numbers)
+        data.label_kinds.frombytes(label_kinds)
+        data.other_labels = other_labels
+        data.statuses.frombytes(statuses)
+        data.nicks.frombytes(nicks)
+        data.nicks = array('I', (nick_ids[i] for i in data.nicks))
+        data.dates.frombytes(dates)
+        return data
+
+class ChapterRow:
+    """Вигляд одного рядка TitleData (без копіювання даних); role — позиція ролі в TitleData.roles;"""
+    __slots__ = ('data', 'index')
+
+    def __init__(self, data, index):
+        self.data = data
+        self.index = index
+
+    @property
+    def label(self):
+        return self.data.label(self.index)
+
+    def status_code(self, role):
+        return (self.data.statuses[self.index] >> (role * STATUS_BITS)) & ((1 << STATUS_BITS) - 1)
+
+    def nick(self, role):
+        data = self.data
+        return data.nick_table[data.nicks[self.index * len(data.roles) + role]]
+
+    def date(self, role):
+        days = self.data.dates[self.index * len(self.data.roles) + role]
+        return date.fromordinal(days + DATE_EPOCH_ORDINAL) if days else None
+
 # ОНОВЛЕНО: Заголовки для аркуша "Журнал"
 LOG_HEADERS = ['Дата', 'Telegram-Нік', 'Нік', 'Тайтл', '№ Розділу', 'Роль']
 
+# Аркуш відповідності "тайтл -> таблиця" (в основній таблиці)
+SHARDS_SHEET_TITLE = "Шарди"
+SHARDS_HEADERS = ['Тайтл', 'Ключ таблиці']
+# Службові аркуші основної таблиці (не є тайтлами)
+SERVICE_SHEET_TITLES = {"Журнал", "Користувачі", SHARDS_SHEET_TITLE}
+
+# Нагадування про завислі завдання (⏳): через скільки днів; щоденний час перевірки (UTC; ГГ:ХХ) та чат команди для дайджесту
+REMINDER_STALE_DAYS = int(os.environ.get("REMINDER_STALE_DAYS", 3))
+REMINDER_TIME = os.environ.get("REMINDER_TIME", '09:00')
+REMINDER_RETRY_INTERVAL = int(os.environ.get("REMINDER_RETRY_INTERVAL", 30 * 60)) # секунд; повтор після невдалого читання таблиць
+TEAM_CHAT_ID = os.environ.get("TEAM_CHAT_ID")
+# Максимум діапазонів в одному values_batch_get (обмеження довжини URL)
+BATCH_GET_MAX_RANGES = 100
+# Ліміт довжини одного повідомлення Telegram (з запасом)
+MESSAGE_LIMIT = 4000
+
+# Імпорт тайтлів з CSV (/import): максимальний розмір файлу та кількість тайтлів в одному файлі
+IMPORT_MAX_BYTES = 1024 * 1024
+IMPORT_MAX_TITLES = 200
+# Назви колонок CSV (нижній регістр) -> поле; ролі можна вказати окремими колонками або однією колонкою 'команда'
+IMPORT_COLUMNS = {
+    'тайтл': 'title', 'назва': 'title',
+    'команда': 'team',
+    'розділи': 'chapters', 'розділ': 'chapters',
+    'клін': 'клін', 'переклад': 'переклад', 'тайп': 'тайп', 'редакт': 'редакт', 'ред': 'редакт', 'бета': 'бета',
+}
+
+# Формати експорту (/export) та розмір фрагмента CSV; після якого він скидається у файл
+EXPORT_FORMATS = ('csv', 'xlsx')
+EXPORT_CHUNK_SIZE = 64 * 1024
+# Файл експорту тримається в пам'яті до цього розміру; більший переноситься на диск
+EXPORT_SPOOL_SIZE = 1024 * 1024
+
+# Inline-пошук тайтлів (@бот назва): кількість результатів; кешування відповіді в Telegram (с) та кількість підказок "можливо; ви мали на увазі"
+INLINE_RESULTS_LIMIT = 20
+INLINE_CACHE_SECONDS = 30
+TITLE_SUGGESTIONS_LIMIT = 3
+
+# Відповідь користувачу; коли зміну записано в outbox; але ще не внесено до таблиці
+QUEUED_MESSAGE = "📝 Запит прийнято; Зміни буде внесено до таблиці; щойно вона буде доступна;"
+
+# --- Трасування оновлень ---
+
+# Траса поточного оновлення; asyncio.to_thread копіює контекст; тож вона доступна і в потоках Sheets
+_current_trace = contextvars.ContextVar('pustobot_trace', default=None)
+
+class Trace:
+    """
+    Траса одного оновлення (або операції outbox; що з нього виникла): ID та спани з таймінгами;
+    Операції outbox продовжують трасу оновлення з тим самим trace_id та часом його надходження (origin);
+    """
+    __slots__ = ('trace_id', 'name', 'origin', 'started', 'spans')
+
+    def __init__(self, name, trace_id=None, origin=None):
+        self.trace_id = trace_id or uuid.uuid4().hex[:16]
+        self.name = name
+        self.origin = origin or time.time() # Коли оновлення надійшло на вебхук
+        self.started = time.perf_counter()
+        self.spans = [] # (назва; початок; тривалість; деталі); секунди від started
+
+    def ref(self):
+        """Посилання на трасу для запису outbox;"""
+        return {'id': self.trace_id, 'origin': self.origin}
+
+    def add(self, name, start, end, detail=None):
+        self.spans.append((name, start - self.started, end - start, detail))
+
+    def mark(self, name):
+        """Спан від кінця попереднього спану до цієї миті (наприклад; очікування в черзі);"""
+        last_end = self.started + (self.spans[-1][1] + self.spans[-1][2] if self.spans else 0)
+        self.add(name, last_end, time.perf_counter())
+
+    def finish(self, slow_ms=TRACE_SLOW_MS):
+        """Завершує трасу; повільні (від надходження оновлення) пишуться в журнал одним JSON-рядком;"""
+        elapsed_ms = (time.perf_counter() - self.started) * 1000
+        since_update_ms = (time.time() - self.origin) * 1000
+        is_slow = since_update_ms >= slow_ms
+        if not is_slow and not logger.isEnabledFor(logging.DEBUG):
+            return
+        record = {
+            'trace_id': self.trace_id,
+            'name': self.name,
+            'ms': round(elapsed_ms, 1),
+            'since_update_ms': round(since_update_ms, 1),
+            'spans': [
+                dict({'name': name, 'at_ms': round(start * 1000, 1), 'ms': round(duration * 1000, 1)}, **({'detail': detail} if detail else {}))
+                for name, start, duration, detail in sorted(self.spans, key=lambda span: span[1])
+            ],
+        }
+        line = json.dumps(record, ensure_ascii=False)
+        if is_slow:
+            logger.warning(f"Повільна операція: {line}")
+        else:
+            logger.debug(f"Траса: {line}")
+
+class TraceSpan:
+    """Контекстний менеджер; що додає до траси спан з тривалістю блоку;"""
+    __slots__ = ('trace', 'name', 'detail', 'start')
+
+    def __init__(self, trace, name, detail=None):
+        self.trace = trace
+        self.name = name
+        self.detail = detail
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.trace.add(self.name, self.start, time.perf_counter(), self.detail)
+
+class _NullSpan:
+    """Спан без траси: нічого не вимірює (трасування вимкнено);"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return None
+
+_NULL_SPAN = _NullSpan()
+
+def trace_span(name, detail=None):
+    """Спан поточної траси; без траси — спільний порожній об'єкт (без виділень пам'яті та вимірів);"""
+    trace = _current_trace.get()
+    return _NULL_SPAN if trace is None else TraceSpan(trace, name, detail)
+
+def traced(name=None):
+    """Декоратор: виклик методу стає спаном поточної траси;"""
+    def decorator(func):
+        span_name = name or f"helper.{func.__name__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            trace = _current_trace.get()
+            if trace is None:
+                return func(*args, **kwargs)
+            with TraceSpan(trace, span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+class TracedHTTPXRequest(HTTPXRequest):
+    """Запити до Bot API (відповіді користувачу) як спани траси;"""
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        with trace_span(f"telegram.{url.rsplit('/', 1)[-1]}"):
+            return await super().do_request(url, method, request_data=request_data, **kwargs)
+
+class TracedApplication(Application):
+    """Application; що виконує кожне оновлення в контексті його траси (створеної у webhook_handler);"""
+    __slots__ = ('pending_traces',)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.pending_traces = {} # update_id -> Trace
+
+    async def process_update(self, update):
+        trace = self.pending_traces.pop(getattr(update, 'update_id', None), None)
+        if trace is None:
+            return await super().process_update(update)
+        # Час між постановкою в чергу (webhook_handler) та початком обробки
+        trace.mark('queue')
+        token = _current_trace.set(trace)
+        try:
+            with TraceSpan(trace, 'handler'):
+                await super().process_update(update)
+        finally:
+            _current_trace.reset(token)
+            trace.finish()
+
+def _is_transient_sheets_error(error):
+    """Визначає; чи є помилка тимчасовою (таблиця недоступна; квота; мережа); такі операції повторюються;"""
+    if isinstance(error, gspread.exceptions.APIError):
+        status_code = getattr(error.response, 'status_code', None) or 0
+        return status_code in (408, 429) or status_code >= 500
+    # Оновлення OAuth-токена без мережі: TransportError обгортає RequestException; але не успадковує його
+    if isinstance(error, google.auth.exceptions.TransportError):
+        return True
+    if isinstance(error, google.auth.exceptions.RefreshError):
+        # retryable: сервер токенів відповів 5xx/429 або server_error; інакше — мережева причина
+        cause = error.__cause__ or error.__context__
+        return error.retryable or (cause is not None and _is_transient_sheets_error(cause))
+    return isinstance(error, (ConnectionError, TimeoutError, requests.exceptions.RequestException))
+
+class SheetsOutbox:
+    """
+    Локальний журнал випереджувального запису (append-only) для змін у Google Sheets;
+    Кожен рядок файлу — JSON: або запис операції {"id"; "op"; "args"; ...}; або позначка {"id"; "state": "done"};
+    """
+    def __init__(self, path):
+        self.path = path
+        self.wakeup = None # asyncio.Event; встановлюється воркером
+        self._lock = threading.Lock()
+        self._pending = {} # id -> запис (dict зберігає порядок додавання)
+        self._done = set()
+        self._load()
+
+    def _load(self):
+        """Відновлює незавершені операції з файлу після перезапуску;"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Обірваний останній рядок (збій під час запису) пропускаємо
+                    logger.warning(f"Пошкоджений рядок у {self.path} пропущено;")
+                    continue
+                if record.get('state') == 'done':
+                    self._pending.pop(record['id'], None)
+                    self._done.add(record['id'])
+                elif record['id'] not in self._done:
+                    self._pending[record['id']] = record
+        if self._pending:
+            logger.info(f"Outbox: відновлено {len(self._pending)} незавершених операцій;")
+        self._compact()
+
+    def _write(self, record):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _compact(self):
+        """Переписує файл лише з незавершеними операціями (щоб він не ріс безкінечно);"""
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for record in self._pending.values():
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._done.clear()
+
+    def append(self, op, args, chat_id=None, parse_mode=None, entry_id=None, trace=None):
+        """
+        Записує операцію на диск (fsync) і повертає її id;
+        Повторний запис з тим самим entry_id ігнорується (ідемпотентність при повторі);
+        trace: посилання на трасу оновлення (Trace;ref()); воркер продовжить її під час застосування;
+        """
+        with self._lock:
+            entry_id = entry_id or uuid.uuid4().hex
+            if entry_id in self._pending or entry_id in self._done:
+                return entry_id
+            record = {
+                'id': entry_id,
+                'op': op,
+                'args': args,
+                'chat_id': chat_id,
+                'parse_mode': parse_mode,
+                'ts': datetime.now().strftime("%d.%m.%Y %H:%M:%S"),
+            }
+            if trace:
+                record['trace'] = trace
+            self._write(record)
+            self._pending[entry_id] = record
+        return entry_id
+
+    def mark_done(self, entry_id):
+        with self._lock:
+            if self._pending.pop(entry_id, None) is None:
+                return
+            self._done.add(entry_id)
+            if self._pending:
+                self._write({'id': entry_id, 'state': 'done'})
+            else:
+                self._compact()
+
+    def pending(self):
+        with self._lock:
+            return list(self._pending.values())
+
+    def notify(self):
+        """Будить воркер після додавання нової операції;"""
+        if self.wakeup is not None:
+            self.wakeup.set()
+
+# Google API віддають gzip лише якщо User-Agent містить "gzip"
+SHEETS_USER_AGENT = "PustoBot (gzip)"
+# Маска полів для метаданих: лише властивості аркушів (без форматування; захисту тощо)
+SHEET_PROPERTIES_FIELDS = "sheets.properties(sheetId,title,index,sheetType,hidden,gridProperties(rowCount,columnCount,frozenRowCount,frozenColumnCount))"
+
+# Завислий розділ: роль призначена (є нік); але статус ❌ довше за REMINDER_STALE_DAYS
+StaleTask = namedtuple('StaleTask', ['title', 'chapter', 'role', 'nickname', 'days'])
+
+def parse_sheet_date(value):
+    """Дата з колонки '-Дата' (ДД.ММ.РРРР) або None;"""
+    try:
+        return datetime.strptime(value.strip(), "%d.%m.%Y").date()
+    except (AttributeError, ValueError):
+        return None
+
+def iter_csv_chunks(rows, chunk_size=EXPORT_CHUNK_SIZE):
+    """Генерує CSV фрагментами (bytes; UTF-8 з BOM для Excel) без побудови одного великого рядка;"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+def write_xlsx(rows, file, sheet_title):
+    """Записує рядки у XLSX (режим write_only: рядки не накопичуються в пам'яті openpyxl);"""
+    workbook = Workbook(write_only=True)
+    # Назва аркуша Excel обмежена 31 символом і не може містити деяких знаків
+    worksheet = workbook.create_sheet(re.sub(r'[\\/*?:\[\]]', '_', sheet_title)[:31] or 'Export')
+    for row in rows:
+        worksheet.append(row)
+    workbook.save(file)
+
+def _sheets_endpoint_detail(endpoint):
+    """Частина URL після ключа таблиці (аркуш; діапазон; метод) для спану траси;"""
+    path = endpoint.split('/spreadsheets/', 1)[-1]
+    key_end = min(i for i in (path.find('/'), path.find(':'), len(path)) if i >= 0)
+    return unquote(path[key_end:].lstrip('/'))[:120] or 'metadata'
+
+class SheetsClient(gspread.Client):
+    """gspread-клієнт з окремими тайм-аутами для читання значень та для інших запитів;"""
+    def request(self, method, endpoint, params=None, data=None, json=None, files=None, headers=None):
+        read_timeout = SHEETS_READ_TIMEOUT if method == 'get' and '/values' in endpoint else SHEETS_WRITE_TIMEOUT
+        trace = _current_trace.get()
+        span = _NULL_SPAN if trace is None else TraceSpan(trace, f"sheets.{method}", _sheets_endpoint_detail(endpoint))
+        with span:
+            response = getattr(self.session, method)(
+                endpoint,
+                json=json,
+                params=params,
+                data=data,
+                files=files,
+                headers=headers,
+                timeout=(SHEETS_CONNECT_TIMEOUT, read_timeout),
+            )
+        if response.ok:
+            return response
+        raise gspread.exceptions.APIError(response)
+
+def build_sheets_client(credentials, pool_size=SHEETS_POOL_SIZE):
+    """Створює клієнт Sheets з пулом keep-alive з'єднань (без повторних TLS-рукостискань) та gzip-відповідями;"""
+    session = AuthorizedSession(credentials)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({'Accept-Encoding': 'gzip', 'User-Agent': SHEETS_USER_AGENT})
+    return SheetsClient(auth=credentials, session=session)
+
+def list_worksheets(spreadsheet):
+    """Список аркушів таблиці одним запитом метаданих з маскою полів;"""
+    metadata = spreadsheet.fetch_sheet_metadata(params={'fields': SHEET_PROPERTIES_FIELDS})
+    return [gspread.Worksheet(spreadsheet, sheet['properties']) for sheet in metadata.get('sheets', [])]
+
+def find_worksheet(spreadsheet, title_name):
+    """Аналог spreadsheet.worksheet(); але з маскою полів для метаданих;"""
+    for worksheet in list_worksheets(spreadsheet):
+        if worksheet.title == title_name:
+            return worksheet
+    raise gspread.WorksheetNotFound(title_name)
+
+def worksheet_properties(worksheet):
+    """Властивості аркуша для знімка кешу (з них gspread.Worksheet відновлюється без запиту метаданих);"""
+    return {
+        'sheetId': worksheet.id, 'title': worksheet.title, 'index': worksheet.index,
+        'gridProperties': {'rowCount': worksheet.row_count, 'columnCount': worksheet.col_count},
+    }
+
+def load_cache_snapshot(path, shard_keys):
+    """Читає знімок кешу; None; якщо файлу немає; він пошкоджений; застарів або зроблений для інших таблиць;"""
+    try:
+        with open(path, 'rb') as f:
+            snapshot = pickle.loads(zlib.decompress(f.read()))
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Не вдалося прочитати знімок кешу {path}: {e}")
+        return None
+    if snapshot.get('version') != CACHE_SNAPSHOT_VERSION or snapshot.get('shard_keys') != shard_keys:
+        logger.info("Знімок кешу зроблено для іншої версії або інших таблиць; пропускаємо;")
+        return None
+    if time.time() - snapshot['saved_at'] > CACHE_SNAPSHOT_MAX_AGE:
+        logger.info("Знімок кешу застарів; пропускаємо;")
+        return None
+    return snapshot
+
+class TitleIndex:
+    """
+    Індекс назв тайтлів у пам'яті для inline-пошуку та підказок при одруках;
+    Пошук без урахування регістру: спершу за префіксом (bisect по відсортованих ключах); далі за початком слова та підрядком; далі нечіткий;
+    Нечіткий пошук порівнює (difflib) лише кандидатів з найбільшою кількістю спільних триграм;
+    Знімок індексу замінюється цілком; тож читання з циклу подій не потребує блокування;
+    """
+    FUZZY_CANDIDATES = 30
+
+    def __init__(self, titles=()):
+        self._lock = threading.Lock()
+        self._keys = [] # Відсортовані нормалізовані назви
+        self._titles = {} # нормалізована назва -> назва аркуша
+        self._trigrams = {} # триграма -> нормалізовані назви; що її містять
+        self.replace(titles)
+
+    @staticmethod
+    def normalize(text):
+        return ' '.join((text or '').casefold().split())
+
+    @staticmethod
+    def _key_trigrams(key):
+        padded = f"  {key} "
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    def replace(self, titles):
+        """Перебудовує індекс (після читання метаданих усіх таблиць);"""
+        by_key = {}
+        for title in titles:
+            by_key.setdefault(self.normalize(title), title)
+        trigrams = {}
+        for key in by_key:
+            for trigram in self._key_trigrams(key):
+                trigrams.setdefault(trigram, []).append(key)
+        with self._lock:
+            self._keys, self._titles, self._trigrams = sorted(by_key), by_key, trigrams
+
+    def add(self, title):
+        """Додає назву нового аркуша (аркуші створюються рідко; тож індекс просто перебудовується);"""
+        if self.normalize(title) not in self._titles:
+            self.replace(list(self._titles.values()) + [title])
+
+    def __len__(self):
+        return len(self._keys)
+
+    def canonical(self, title):
+        """Назва аркуша; що відрізняється від введеної лише регістром або пробілами; або None;"""
+        return self._titles.get(self.normalize(title))
+
+    def _prefixed(self, keys, key):
+        start = bisect.bisect_left(keys, key)
+        end = bisect.bisect_left(keys, key + '\U0010ffff')
+        return keys[start:end]
+
+    def _fuzzy(self, key, limit):
+        shared = {}
+        trigrams = self._trigrams
+        for trigram in self._key_trigrams(key):
+            for candidate in trigrams.get(trigram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+        candidates = sorted(shared, key=shared.get, reverse=True)[:self.FUZZY_CANDIDATES]
+        return difflib.get_close_matches(key, candidates, n=limit, cutoff=0.6)
+
+    def search(self, query, limit=INLINE_RESULTS_LIMIT):
+        """Назви для inline-запиту; найкращі збіги першими;"""
+        keys, titles = self._keys, self._titles
+        key = self.normalize(query)
+        if not key:
+            return [titles[k] for k in keys[:limit]]
+
+        found = self._prefixed(keys, key)[:limit]
+        seen = set(found)
+        # Початок будь-якого слова; потім будь-який підрядок
+        for matches in (
+            (k for k in keys if f' {key}' in f' {k}'),
+            (k for k in keys if key in k),
+        ):
+            for k in matches:
+                if len(found) >= limit:
+                    break
+                if k not in seen:
+                    found.append(k)
+                    seen.add(k)
+        if len(found) < limit:
+            found.extend(k for k in self._fuzzy(key, limit) if k not in seen)
+        return [titles[k] for k in found[:limit]]
+
+    def suggest(self, title, limit=TITLE_SUGGESTIONS_LIMIT):
+        """Підказки "можливо; ви мали на увазі" для назви; якої немає в індексі;"""
+        keys, titles = self._keys, self._titles
+        key = self.normalize(title)
+        if not key or key in titles:
+            return []
+        found = self._fuzzy(key, limit)
+        # Назва могла бути введена не повністю
+        found.extend(k for k in self._prefixed(keys, key) if k not in found)
+        return [titles[k] for k in found[:limit]]
+
 class SheetsHelper:
     """Клас для інкапсуляції всієї роботи з Google Sheets;"""
-    def __init__(self, credentials_file, spreadsheet_key):
-        # ... (метод init залишається без змін)
+    # Операції outbox -> методи; які їх застосовують
+    OUTBOX_OPERATIONS = {
+        'register': 'register_user',
+        'set_team': 'set_team',
+        'add_chapters': 'add_chapters',
+        'import_titles': 'import_titles',
+        'update_status': '_apply_update_status',
+        'log': '_write_log_row',
+    }
+
+    def __init__(self, credentials_file, spreadsheet_key, outbox=None, shard_keys=None, snapshot_file=None):
+        self.credentials_file = credentials_file
+        self.spreadsheet_key = spreadsheet_key
+        # Основна таблиця завжди перша серед шардів
+        self.shard_keys = [spreadsheet_key] + [k for k in (shard_keys or []) if k != spreadsheet_key]
+        self.outbox = outbox
         self.spreadsheet = None
+        self.shards = {} # ключ таблиці -> Spreadsheet
         self.log_sheet = None
         self.users_sheet = None
+        self.shards_sheet = None
+        self._worksheets = {} # тайтл -> Worksheet (щоб не робити запит метаданих на кожну команду)
+        self.title_index = TitleIndex() # Пошук назв тайтлів без звернень до таблиці
+        self._title_shards = {} # тайтл -> ключ таблиці
+        self._mapped_titles = set() # тайтли; записані на аркуші 'Шарди'
+        self._shard_cells = {} # ключ таблиці -> кількість клітинок (для вибору найменш завантаженої)
+        self._schemas = {} # тайтл -> SheetSchema
+        self._prepared_titles = {} # тайтл -> рядок 3 (кортеж); для якого вже встановлено валідацію статусів
+        self._title_data = {} # тайтл -> TitleData; компактний in-memory вигляд для нагадувань та статусу
+        self._nick_table = StringTable() # Спільна таблиця ніків для всіх TitleData
+        self._users = {} # Telegram-ID -> (Теґ; Нік)
+        self._current_entry = None # Запис outbox; який зараз застосовується
+        self.snapshot_file = snapshot_file
+        self.restored_from_snapshot = False
+        self._snapshot_titles = set() # тайтли; чиї дані взяті зі знімка і ще не звірені з таблицею
+        self._snapshot = load_cache_snapshot(snapshot_file, self.shard_keys) if snapshot_file else None
+        self.connect()
+
+    @traced()
+    def connect(self):
+        """(Пере)підключається до Google Sheets; повертає True у разі успіху;"""
         try:
-            gc = gspread.service_account(filename=credentials_file)
-            self.spreadsheet = gc.open_by_key(spreadsheet_key) 
-            self._initialize_sheets()
+            gc = self._build_client()
+            self.shards = dict(zip(self.shard_keys, self._map_parallel(gc.open_by_key, self.shard_keys)))
+            self.spreadsheet = self.shards[self.spreadsheet_key]
+            # Теплий старт: карта аркушів зі знімка (перевіряється у фоні validate_snapshot)
+            snapshot, self._snapshot = self._snapshot, None
+            if not (snapshot and self._restore_snapshot(snapshot)):
+                self._initialize_sheets()
+                self._load_title_map()
+            return True
         except Exception as e:
             logger.error(f"Не вдалося підключитися до Google Sheets: {e}")
+            self.spreadsheet = None
+            return False
+
+    def _build_client(self):
+        credentials = ServiceAccountCredentials.from_service_account_file(self.credentials_file, scopes=gspread.auth.DEFAULT_SCOPES)
+        # Пул розрахований на паралельні запити до всіх шардів
+        return build_sheets_client(credentials, pool_size=max(SHEETS_POOL_SIZE, len(self.shard_keys)))
+
+    def apply_outbox_entry(self, entry):
+        """Застосовує одну операцію з outbox; тимчасові помилки Sheets пробрасуються для повтору;"""
+        method = getattr(self, self.OUTBOX_OPERATIONS[entry['op']])
+        self._current_entry = entry
+        try:
+            return method(**entry['args'])
+        finally:
+            self._current_entry = None
+
+    def _action_time(self):
+        """Час дії: момент постановки в чергу (для outbox) або поточний;"""
+        if self._current_entry:
+            return datetime.strptime(self._current_entry['ts'], "%d.%m.%Y %H:%M:%S")
+        return datetime.now()
+
+    @staticmethod
+    def _map_parallel(func, items):
+        """Виконує func для кожного елемента паралельно (запити до різних таблиць не чекають один одного);"""
+        items = list(items)
+        if len(items) <= 1:
+            return [func(item) for item in items]
+        # Кожен потік отримує копію контексту (траса поточного оновлення)
+        contexts = [contextvars.copy_context() for _ in items]
+        with ThreadPoolExecutor(max_workers=len(items)) as executor:
+            return list(executor.map(lambda context, item: context.run(func, item), contexts, items))
+
+    def _load_title_map(self):
+        """Будує карту тайтл -> аркуш/таблиця: один запит метаданих на кожну таблицю (паралельно) та аркуш 'Шарди';"""
+        worksheets_by_shard = self._map_parallel(list_worksheets, self.shards.values())
+
+        worksheets = {}
+        title_shards = {}
+        shard_cells = {}
+        for key, shard_worksheets in zip(self.shards, worksheets_by_shard):
+            shard_cells[key] = 0
+            for worksheet in shard_worksheets:
+                shard_cells[key] += worksheet.row_count * worksheet.col_count
+                if key == self.spreadsheet_key and worksheet.title in SERVICE_SHEET_TITLES:
+                    continue
+                worksheets[worksheet.title] = worksheet
+                title_shards[worksheet.title] = key
+
+        # Явна відповідність з аркуша 'Шарди' (дозволяє заздалегідь закріпити тайтл за таблицею)
+        mapped_titles = set()
+        if self.shards_sheet:
+            for row in self.shards_sheet.get_all_values()[3:]:
+                if len(row) < 2 or not row[0].strip():
+                    continue
+                title, key = row[0].strip(), row[1].strip()
+                mapped_titles.add(title)
+                if key not in self.shards:
+                    logger.warning(f"Тайтл '{title}' закріплено за невідомою таблицею {key}; Додайте її до SPREADSHEET_SHARD_KEYS;")
+                    continue
+                if title not in worksheets:
+                    title_shards[title] = key
+
+        self._worksheets = worksheets
+        self.title_index.replace(worksheets)
+        self._title_shards = title_shards
+        self._mapped_titles = mapped_titles
+        self._shard_cells = shard_cells
+        logger.info(f"Завантажено {len(worksheets)} тайтлів з {len(self.shards)} таблиць;")
+
+    def _worksheet(self, title_name):
+        """
+        Повертає аркуш тайтлу з його таблиці (шарду); WorksheetNotFound; якщо тайтлу немає;
+        Невідома назва завжди перевіряється в таблицях; навіть схожа на відомий тайтл
+        (аркуш могла створити інша репліка або редактор; напр; продовження тайтлу)
+        """
+        worksheet = self._worksheets.get(title_name)
+        if worksheet:
+            return worksheet
+
+        # Аркуш міг бути створений поза ботом; шукаємо у закріпленій таблиці або в усіх (паралельно)
+        key = self._title_shards.get(title_name)
+        keys = [key] if key in self.shards else list(self.shards)
+
+        def find(shard_key):
+            try:
+                return find_worksheet(self.shards[shard_key], title_name)
+            except gspread.WorksheetNotFound:
+                return None
+
+        for shard_key, worksheet in zip(keys, self._map_parallel(find, keys)):
+            if worksheet:
+                self._worksheets[title_name] = worksheet
+                self._title_shards[title_name] = shard_key
+                self.title_index.add(title_name)
+                return worksheet
+        raise gspread.WorksheetNotFound(title_name)
+
+    def _shard_for_new_title(self, title_name):
+        """Таблиця для нового тайтлу: закріплена на аркуші 'Шарди' або найменш завантажена (за кількістю клітинок);"""
+        key = self._title_shards.get(title_name)
+        if key in self.shards:
+            return key
+        return min(self.shards, key=lambda shard_key: self._shard_cells.get(shard_key, 0))
 
     # ВИПРАВЛЕННЯ 1: Змінено логіку вставки заголовків
+    @traced()
     def _get_or_create_worksheet(self, title_name, headers=None, force_headers=False):
         """
         Отримує або створює аркуш за назвою; 
         Заголовки (якщо передані та force_headers=True) вставляються в рядок 3;
-        Аркуші Тайтлів створюються без заголовків тут;
+        Аркуші Тайтлів створюються без заголовків тут; у найменш завантаженій таблиці;
         """
         if not self.spreadsheet: raise ConnectionError("Немає підключення до Google Sheets;")
+        is_service_sheet = title_name in SERVICE_SHEET_TITLES
         try:
-            return self.spreadsheet.worksheet(title_name)
+            if is_service_sheet:
+                return find_worksheet(self.spreadsheet, title_name)
+            return self._worksheet(title_name)
         except gspread.WorksheetNotFound:
-            logger.info(f"Створення нового аркуша: {title_name}")
+            shard_key = self.spreadsheet_key if is_service_sheet else self._shard_for_new_title(title_name)
+            logger.info(f"Створення нового аркуша: {title_name} (таблиця {shard_key})")
             cols = len(headers) if headers else 20
             # Створюємо аркуш
-            worksheet = self.spreadsheet.add_worksheet(title=title_name, rows="100", cols=str(cols))
+            worksheet = self.shards[shard_key].add_worksheet(title=title_name, rows="100", cols=str(cols))
+            self._shard_cells[shard_key] = self._shard_cells.get(shard_key, 0) + 100 * cols
             
-            # Тільки якщо `force_headers=True` (для Журналу; Користувачів); вставляємо заголовки
+            # Тільки якщо `force_headers=True` (для Журналу; Користувачів; Шардів); вставляємо заголовки
             if headers and force_headers: 
                 # Вставляємо порожні рядки 1 та 2
                 worksheet.insert_row([], 1) 
                 worksheet.insert_row([], 2) 
                 # Додаємо заголовки в 3-й рядок
                 worksheet.insert_row(headers, 3) 
+
+            if not is_service_sheet:
+                self._worksheets[title_name] = worksheet
+                self._title_shards[title_name] = shard_key
+                self.title_index.add(title_name)
+                self._record_title_shard(title_name, shard_key)
             return worksheet
+
+    def _title_not_found(self, title_name, hint=""):
+        """Повідомлення про відсутній тайтл з підказками з індексу назв;"""
+        message = f"⚠️ Тайтл '{title_name}' не знайдено;{hint}"
+        suggestions = self.title_index.suggest(title_name)
+        if suggestions:
+            message += "\nМожливо; ви мали на увазі: " + "; ".join(f'"{title}"' for title in suggestions)
+        return message
+
+    def _record_title_shard(self, title_name, shard_key):
+        """Записує розміщення нового тайтлу на аркуш 'Шарди';"""
+        self._record_title_shards([(title_name, shard_key)])
+
+    def _record_title_shards(self, placements):
+        """Записує розміщення кількох нових тайтлів на аркуш 'Шарди' одним додаванням рядків;"""
+        rows = [[title_name, shard_key] for title_name, shard_key in placements if title_name not in self._mapped_titles]
+        if not self.shards_sheet or not rows:
+            return
+        try:
+            self.shards_sheet.append_rows(rows)
+            self._mapped_titles.update(row[0] for row in rows)
+        except Exception as e:
+            # Не критично: під час наступного підключення тайтл буде знайдено за метаданими
+            logger.error(f"Не вдалося записати розміщення тайтлів ({'; '.join(row[0] for row in rows)}): {e}")
             
     def _initialize_sheets(self):
         """Ініціалізує основні аркуші (Журнал; Users; Тайтли);"""
@@ -108,32 +1140,61 @@ class SheetsHelper:
             logger.error(f"Не вдалося ініціалізувати аркуш 'Користувачі': {e}")
             self.users_sheet = None
 
+        # Ініціалізація аркуша відповідності тайтлів таблицям (force_headers=True)
+        try:
+            self.shards_sheet = self._get_or_create_worksheet(SHARDS_SHEET_TITLE, SHARDS_HEADERS, force_headers=True)
+        except Exception as e:
+            logger.error(f"Не вдалося ініціалізувати аркуш '{SHARDS_SHEET_TITLE}': {e}")
+            self.shards_sheet = None
+
     def _log_action(self, telegram_tag, nickname, title, chapter, role):
         """Додає запис про операцію до аркуша 'Журнал';"""
+        current_datetime = self._action_time().strftime("%d.%m.%Y %H:%M:%S")
+        # Структура: Дата; Telegram-Нік; Нік; Тайтл; № Розділу; Роль
+        log_row = [
+            current_datetime,
+            telegram_tag,
+            nickname,
+            title,
+            str(chapter),
+            role
+        ]
+        self._log_rows([log_row])
+
+    @traced('journal')
+    def _log_rows(self, log_rows):
+        """Додає рядки журналу одним додаванням (масові операції пишуть один запис на тайтл);"""
+        if self.outbox is not None and self._current_entry:
+            # Запис журналу — окрема операція outbox з детермінованим id;
+            # тож повторне застосування батьківської операції не дублює рядки
+            self.outbox.append('log', {'rows': log_rows}, entry_id=f"{self._current_entry['id']}:log", trace=self._current_entry.get('trace'))
+            return
         if self.log_sheet:
             try:
-                current_datetime = datetime.now().strftime("%d.%m.%Y %H:%M:%S")
-                # Структура: Дата; Telegram-Нік; Нік; Тайтл; № Розділу; Роль
-                log_row = [
-                    current_datetime,
-                    telegram_tag,
-                    nickname,
-                    title,
-                    str(chapter),
-                    role
-                ]
-                self.log_sheet.append_row(log_row)
+                self.log_sheet.append_rows(log_rows)
             except Exception as e:
                 logger.error(f"Помилка логування дії: {e}")
         else:
             logger.warning("Аркуш 'Журнал' не ініціалізовано; логування пропущено;")
 
+    @traced('journal')
+    def _write_log_row(self, row=None, rows=None):
+        """Застосовує операцію outbox 'log' (row — записи; створені до пакетного журналу); помилки пробрасуються для повтору;"""
+        if not self.log_sheet:
+            self._initialize_sheets()
+        if not self.log_sheet:
+            raise ConnectionError("Аркуш 'Журнал' не ініціалізовано;")
+        self.log_sheet.append_rows(rows or [row])
+
     # --- НОВИЙ МЕТОД ДЛЯ ОТРИМАННЯ НІКНЕЙМА ---
+    @traced()
     def get_nickname_by_id(self, user_id):
-        """Отримує зареєстрований Нік користувача за його Telegram-ID;"""
-        if not self.users_sheet: 
-            logger.warning("Аркуш 'Користувачі' не ініціалізовано; неможливо отримати нік;")
-            return None
+        """
+        Отримує зареєстрований Нік користувача за його Telegram-ID (None — не зареєстрований);
+        Тимчасові помилки Sheets пробрасуються: outbox повторить операцію; а не запише нік з Telegram-профілю;
+        """
+        if not self.users_sheet and self.spreadsheet: self._initialize_sheets()
+        if not self.users_sheet: raise ConnectionError("Аркуш 'Користувачі' не ініціалізовано;")
         try:
             # Знаходимо користувача за ID (колонка 1)
             user_ids = self.users_sheet.col_values(1)
@@ -146,13 +1207,16 @@ class SheetsHelper:
                 return nickname if nickname and nickname.strip() else None
             return None
         except Exception as e:
+            if _is_transient_sheets_error(e): raise # Повториться з outbox
             logger.error(f"Помилка отримання нікнейма для ID {user_id}: {e}")
             return None
     # ---------------------------------------------
 
+    @traced()
     def register_user(self, user_id, username, nickname):
         """Реєструє або оновлює користувача на аркуші 'Користувачі';"""
-        if not self.users_sheet: return "Помилка підключення до таблиці 'Користувачі';"
+        if not self.users_sheet and self.spreadsheet: self._initialize_sheets()
+        if not self.users_sheet: raise ConnectionError("Аркуш 'Користувачі' не ініціалізовано;")
         try:
             users_sheet = self.users_sheet
             # Знаходимо користувача за ID (колонка 1)
@@ -170,13 +1234,15 @@ class SheetsHelper:
                 users_sheet.append_row([str(user_id), username, nickname, ''])
                 return f"✅ Вас успішно зареєстровано; Нікнейм: {nickname}"
         except Exception as e:
+            if _is_transient_sheets_error(e): raise # Повториться з outbox
             logger.error(f"Помилка реєстрації: {e}")
             return "❌ Сталася помилка під час реєстрації;"
 
     # ВИПРАВЛЕННЯ 2: set_team тепер лише встановлює команду в A2
+    @traced()
     def set_team(self, title_name, team_string, beta_nickname, telegram_tag, nickname):
         """Створює аркуш (якщо його немає) та встановлює команду тайтлу в A2;"""
-        if not self.spreadsheet: return "Помилка підключення до таблиці;"
+        if not self.spreadsheet: raise ConnectionError("Немає підключення до Google Sheets;")
         
         try:
             # Створюємо аркуш; якщо його немає; (заголовки не додаються)
@@ -184,6 +1250,9 @@ class SheetsHelper:
 
             # 1. Записуємо команду в клітинку A2
             worksheet.update_acell('A2', team_string)
+            self._invalidate_title_data(title_name)
+            # Склад команди (бета) визначає шапку; її буде перевірено при додаванні розділу
+            self._prepared_titles.pop(title_name, None)
             
             # 2. Логування
             self._log_action(
@@ -198,28 +1267,51 @@ class SheetsHelper:
             return f"✅ Команда для тайтлу '{title_name}' успішно встановлена;{beta_info}\n_Шапка (заголовки) будуть створені автоматично при додаванні першого розділу;_"
             
         except gspread.WorksheetNotFound:
-            return f"⚠️ Тайтл '{title_name}' не знайдено;"
+            return self._title_not_found(title_name)
         except Exception as e:
+            if _is_transient_sheets_error(e): raise # Повториться з outbox
             logger.error(f"Помилка встановлення команди: {e}")
             return "❌ Сталася помилка при встановленні команди;"
 
+    def _invalidate_title_data(self, title_name):
+        """Бот змінює аркуш: in-memory дані тайтлу застаріли (наступне читання — з таблиці; у знімок вони не потраплять);"""
+        self._title_data.pop(title_name, None)
+        self._snapshot_titles.discard(title_name)
+
+    def _schema(self, title_name, worksheet, headers=None):
+        """
+        Повертає скомпільовану схему аркуша; рядок 3 читається лише якщо схеми ще немає;
+        Якщо передано headers (вже прочитані); схема перекомпілюється тільки коли вони змінилися;
+        """
+        schema = self._schemas.get(title_name)
+        if headers is None:
+            if schema is not None:
+                return schema
+            headers = worksheet.row_values(3)
+        if schema is None or not schema.matches(headers):
+            schema = SheetSchema(headers, version=schema.version + 1 if schema else 1)
+            self._schemas[title_name] = schema
+        return schema
+
     # ЗМІНА 2: Додавання випадного списку статусу; Оновлення рядка;
-    def _prepare_worksheet_headers(self, worksheet, title_name):
-        """Перевіряє і створює правильну шапку (заголовки) та встановлює правила валідації (випадний список);"""
+    @traced()
+    def _prepare_worksheet_headers(self, worksheet, title_name, values):
+        """
+        Перевіряє і створює правильну шапку (заголовки) та встановлює правила валідації (випадний список);
+        values: вже прочитані значення аркуша (A2 — команда; рядок 3 — заголовки); таблиця не перечитується;
+        Повертає схему аркуша; якщо рядок 3 відповідає команді і валідацію для нього вже встановлено — лише схему;
+        """
         # 1. Визначаємо; чи є бета-роль в команді (рядок A2)
-        try:
-            team_string = worksheet.acell('A2').value or ''
-        except Exception:
-            team_string = ''
-            
-        has_beta_in_team = 'бета -' in team_string.lower()
+        team_string = values[1][0] if len(values) > 1 and values[1] else ''
+        has_beta_in_team = team_has_beta(team_string)
         required_headers = generate_sheet_headers(include_beta=has_beta_in_team)
         
-        # 2. Перевіряємо та створюємо/оновлюємо заголовки в рядку 3
-        try:
-            current_headers = worksheet.row_values(3)
-        except gspread.exceptions.APIError:
-            current_headers = []
+        # 2. Перевіряємо та створюємо/оновлюємо заголовки в рядку 3 (get_all_values доповнює рядки порожніми клітинками)
+        current_headers = list(values[2]) if len(values) > 2 else []
+        while current_headers and not current_headers[-1]:
+            current_headers.pop()
+        if current_headers == required_headers and self._prepared_titles.get(title_name) == tuple(required_headers):
+            return self._schema(title_name, worksheet, required_headers)
         
         headers_updated = False
         if not current_headers or current_headers != required_headers:
@@ -233,20 +1325,61 @@ class SheetsHelper:
             
             worksheet.insert_row(required_headers, 3) # Вставляємо заголовки в 3-й рядок
             headers_updated = True
-            
-        # 3. Встановлення правила валідації для статусу (випадний список)
-        
-        # Визначаємо колонки Статусу (всі; що закінчуються на '-Статус')
-        status_cols = [
-            i + 1 for i, header in enumerate(required_headers) 
-            if header.endswith('-Статус')
-        ]
+
+        schema = self._schema(title_name, worksheet, required_headers)
+
+        # 3. Встановлення правила валідації для статусу (випадний список) та кольорів
+        self._apply_status_validation(worksheet, required_headers, fresh_sheet=headers_updated and not current_headers)
+        self._prepared_titles[title_name] = tuple(required_headers)
+        return schema
+
+    @traced()
+    def _apply_status_validation(self, worksheet, headers, fresh_sheet=False):
+        """
+        Випадний список ✅/❌ та умовне форматування для всіх колонок '-Статус' одним batch_update;
+        Якщо правила вже є для поточного розташування колонок — нічого не робить;
+        Для нового аркуша правил ще немає; тож метадані не читаються;
+        """
+        stale_rule_indexes = []
+        stale_columns = set()
+        if not fresh_sheet:
+            try:
+                metadata = worksheet.spreadsheet.fetch_sheet_metadata(params={
+                    'ranges': gspread.utils.absolute_range_name(worksheet.title, 'A1'),
+                    'fields': CONDITIONAL_FORMATS_FIELDS,
+                })
+            except gspread.exceptions.APIError as e:
+                logger.error(f"Не вдалося прочитати правила форматування для {worksheet.title}: {e}")
+                return
+            rules = next(
+                (sheet.get('conditionalFormats', []) for sheet in metadata.get('sheets', [])
+                 if sheet['properties']['sheetId'] == worksheet.id),
+                [],
+            )
+            stale_rule_indexes = [i for i, rule in enumerate(rules) if is_status_format_rule(rule)]
+            expected_columns = status_columns(headers)
+            rule_columns = [
+                sorted((r.get('startColumnIndex', 0), r.get('endColumnIndex')) for r in rules[i].get('ranges', []))
+                for i in stale_rule_indexes
+            ]
+            if len(rule_columns) == len(STATUS_VALUES) and all(columns == expected_columns for columns in rule_columns):
+                return # Правила вже відповідають заголовкам
+            # Діапазон без межі (правило змінено вручну) охоплює весь аркуш — його валідацію не знімаємо
+            stale_columns = {(start, end) for columns in rule_columns for start, end in columns if end is not None}
+
+        requests = status_validation_requests(worksheet.id, headers, stale_rule_indexes, stale_columns)
+        try:
+            worksheet.spreadsheet.batch_update({'requests': requests})
+        except gspread.exceptions.APIError as e:
+            # Без валідації таблиця працює як раніше; спроба повториться після зміни команди або перезапуску
+            logger.error(f"Не вдалося встановити валідацію статусів для {worksheet.title}: {e}")
         
     # --- ВИПРАВЛЕННЯ: КОПІЮВАННЯ ФОРМАТУВАННЯ ТА ВСТАВКА ДАНИХ ---
     # Використовуємо values_update для пакетного оновлення (ВИПРАВЛЯЄ ПОМИЛКУ 400)
     # та insert_row для копіювання форматування
      # --- ВИПРАВЛЕННЯ: КОПІЮВАННЯ ФОРМАТУВАННЯ ТА ВСТАВКА ДАНИХ (БЕЗ values_update) ---
     # --- ВИПРАВЛЕНИЙ МЕТОД КОПІЮВАННЯ ФОРМАТУВАННЯ ---
+    @traced()
     def _copy_formatting_and_insert_data(self, worksheet, last_data_row_index, new_rows_data):
         """
         Копіює форматування з останнього заповненого рядка, вставляючи нові рядки, 
@@ -282,93 +1415,55 @@ class SheetsHelper:
                 value_input_option='USER_ENTERED'
             )
         
+    def _insert_chapters(self, worksheet, title_name, chapter_numbers):
+        """Готує шапку та вставляє нові розділи (дублікати пропускаються); повертає (додані; дублікати);"""
+        self._invalidate_title_data(title_name)
+        all_values = worksheet.get_all_values()
+        # 1. Перевірка та створення/оновлення заголовків та валідації за прочитаними A2 та рядком 3 (схема визначає розмір рядка)
+        schema = self._prepare_worksheet_headers(worksheet, title_name, all_values)
+        
+        # 2. Перевірка на дублікати розділів
+        data_rows = all_values[3:]
+        existing_chapters = {row[0].strip().lstrip("'") for row in data_rows if row and row[0].strip()} 
+        
+        chapters_to_add = [c for c in chapter_numbers if str(c) not in existing_chapters]
+        duplicate_chapters = [c for c in chapter_numbers if str(c) in existing_chapters]
+        if not chapters_to_add:
+            return chapters_to_add, duplicate_chapters
+        
+        # Визначаємо індекс останнього заповненого рядка ДАНИХ (після заголовків; рядок 3 міг щойно з'явитися)
+        last_data_row_index = max(len(all_values), 3) 
+
+        # 3. Створення рядків для розділів (Нік/Дата порожні; Статус='❌' для всіх ролей і Публікації)
+        new_rows_data = [schema.new_chapter_row(chapter_number) for chapter_number in chapters_to_add]
+
+        # --- КОПІЮВАННЯ ФОРМАТУВАННЯ ТА ВСТАВКА ДАНИХ ---
+        # Якщо є існуючі дані (last_data_row_index > 3); копіюємо форматування
+        if last_data_row_index >= 4: # Рядки з даними починаються з 4-го
+            self._copy_formatting_and_insert_data(worksheet, last_data_row_index, new_rows_data)
+        else:
+             # Якщо даних ще немає, просто додаємо нові рядки (після заголовків)
+             # USER_ENTERED: як і при копіюванні форматування; лапка не потрапляє в значення клітинки
+             worksheet.append_rows(new_rows_data, value_input_option='USER_ENTERED')
+        return chapters_to_add, duplicate_chapters
+
     # --- ВИПРАВЛЕНИЙ МЕТОД ДОДАВАННЯ РОЗДІЛІВ ---
+    @traced()
     def add_chapters(self, title_name, chapter_numbers, telegram_tag, nickname):
         """Додає один або кілька розділів до аркуша тайтлу;"""
-        if not self.spreadsheet: return "Помилка підключення до таблиці;"
+        if not self.spreadsheet: raise ConnectionError("Немає підключення до Google Sheets;")
         try:
-            try:
-                worksheet = self.spreadsheet.worksheet(title_name)
-            except gspread.WorksheetNotFound:
-                worksheet = self._get_or_create_worksheet(title_name) 
-
-            # 1. Перевірка та створення/оновлення заголовків та валідації
-            self._prepare_worksheet_headers(worksheet, title_name)
-            
-            # Визначаємо; чи є бета-роль в команді (рядок A2) для коректного розміру рядка
-            try:
-                team_string = worksheet.acell('A2').value or ''
-            except Exception:
-                team_string = ''
-            
-            has_beta_in_team = 'бета -' in team_string.lower()
-            
-            # Генерація ролей для створення рядка
-            base_roles = list(ROLE_TO_COLUMN_BASE.values())
-            if has_beta_in_team:
-                base_roles.append("Бета")
-                
-            num_roles = len(base_roles)
-            
-            # 2. Перевірка на дублікати розділів
-            all_values = worksheet.get_all_values()
-            data_rows = all_values[3:]
-            existing_chapters = {row[0].strip().lstrip("'") for row in data_rows if row and row[0].strip()} 
-            
-            chapters_to_add = [c for c in chapter_numbers if str(c) not in existing_chapters]
-            duplicate_chapters = [c for c in chapter_numbers if str(c) in existing_chapters]
+            worksheet = self._get_or_create_worksheet(title_name)
+            chapters_to_add, duplicate_chapters = self._insert_chapters(worksheet, title_name, chapter_numbers)
             
             if not chapters_to_add:
                 return f"⚠️ Всі розділи ({'; '.join(map(str, duplicate_chapters))}) для '{title_name}' вже існують;"
             
-            # Визначаємо індекс останнього заповненого рядка ДАНИХ (після заголовків)
-            last_data_row_index = len(all_values) 
-
-            # 3. Створення рядків для розділів
-            new_rows_data = []
-            for chapter_number in chapters_to_add:
-                # ВИПРАВЛЕННЯ 1: Додаємо одинарну лапку для запобігання конвертації в дату
-                new_row_data = [f"'{chapter_number}"] # Розділ
-            
-                # Додаємо дані для основних ролей (Нік; Дата; Статус='❌')
-                for _ in range(num_roles):
-                    new_row_data.extend(['', '', '❌']) 
-                
-                # ОНОВЛЕНО: Додаємо дані для Публікації (Дата=''; Статус='❌')
-                new_row_data.extend(['', '❌'])
-                
-                new_rows_data.append(new_row_data)
-
-            # --- КОПІЮВАННЯ ФОРМАТУВАННЯ ТА ВСТАВКА ДАНИХ ---
-            # Якщо є існуючі дані (last_data_row_index > 3); копіюємо форматування
-            if last_data_row_index >= 4: # Рядки з даними починаються з 4-го
-                self._copy_formatting_and_insert_data(worksheet, last_data_row_index, new_rows_data)
-            else:
-                 # Якщо даних ще немає, просто додаємо нові рядки (після заголовків)
-                 worksheet.append_rows(new_rows_data)
-            # --------------------------------------------------
-            
             # 4. Логування (якщо розділів багато; логуємо діапазон)
+            chapter_log = format_chapter_log(chapters_to_add)
             if len(chapters_to_add) == 1:
-                chapter_log = str(chapters_to_add[0])
                 response_msg = f"✅ Додано розділ {chapter_log} до тайтлу '{title_name}'."
             else:
-                # При логуванні діапазону для дробових номерів беремо min/max
-                try:
-                    # Конвертуємо в float для сортування (для коректного min/max дробових)
-                    sorted_chapters = sorted([float(c) for c in chapters_to_add])
-                    first = sorted_chapters[0]
-                    last = sorted_chapters[-1]
-                    
-                    # Форматуємо назад в рядок (без зайвих .0)
-                    str_first = str(first) if '.' in str(first) else str(int(first))
-                    str_last = str(last) if '.' in str(last) else str(int(last))
-                    
-                    chapter_log = f"{str_first}-{str_last} ({len(chapters_to_add)} шт;)"
-                except ValueError:
-                    # Якщо є нечислові значення; просто логуємо кількість
-                    chapter_log = f"({len(chapters_to_add)} шт;)"
-                    
                 response_msg = f"✅ Додано {len(chapters_to_add)} розділів ({chapter_log}) до тайтлу '{title_name}'."
 
             self._log_action(telegram_tag=telegram_tag, nickname=nickname, title=title_name, chapter=chapter_log, role="Додано розділ(и)")
@@ -378,10 +1473,171 @@ class SheetsHelper:
 
             return response_msg
         except Exception as e:
+            if _is_transient_sheets_error(e): raise # Повториться з outbox
             logger.error(f"Помилка додавання розділу(ів): {e}")
             return "❌ Сталася помилка при додаванні розділу(ів);"
     
+    def _plan_import_chapters(self, shard_key, entries):
+        """
+        Розділи існуючих тайтлів однієї таблиці для імпорту: аркуші читаються одним values_batch_get;
+        шапка звіряється з новою командою (A2 ще не записано; тож підставляється з імпорту);
+        Повертає (запити insertDimension; діапазони значень нових рядків; додані розділи по тайтлах; попередження);
+        """
+        entries = [entry for entry in entries if entry['chapter_numbers']]
+        if not entries:
+            return [], [], {}, []
+        fetched = self._fetch_shard_values(shard_key, [entry['title_name'] for entry in entries])
+        insert_requests, data, added, warnings = [], [], {}, []
+        for entry in entries:
+            title_name = entry['title_name']
+            worksheet = self._worksheets[title_name]
+            values = list(fetched.get(title_name, []))
+            while len(values) < 2:
+                values.append([''])
+            values[1] = [entry['team_string']] + list(values[1][1:])
+            try:
+                schema = self._prepare_worksheet_headers(worksheet, title_name, values)
+            except Exception as e:
+                if _is_transient_sheets_error(e): raise # Повториться з outbox (створені аркуші вже будуть існуючими)
+                logger.error(f"Помилка додавання розділів до '{title_name}' під час імпорту: {e}")
+                warnings.append(f"⚠️ '{title_name}': не вдалося додати розділи;")
+                continue
+
+            existing_chapters = {row[0].strip().lstrip("'") for row in values[3:] if row and row[0].strip()}
+            added[title_name] = [c for c in entry['chapter_numbers'] if str(c) not in existing_chapters]
+            if not added[title_name]:
+                continue
+            # Як у _copy_formatting_and_insert_data: рядки після останнього рядка даних успадковують його форматування
+            last_data_row_index = max(len(values), 3)
+            insert_requests.append({'insertDimension': {
+                'range': {'sheetId': worksheet.id, 'dimension': 'ROWS',
+                          'startIndex': last_data_row_index, 'endIndex': last_data_row_index + len(added[title_name])},
+                'inheritFromBefore': last_data_row_index >= 4,
+            }})
+            data.append({
+                'range': gspread.utils.absolute_range_name(title_name, f'A{last_data_row_index + 1}'),
+                'values': [schema.new_chapter_row(c) for c in added[title_name]],
+            })
+        return insert_requests, data, added, warnings
+
+    @traced()
+    def import_titles(self, titles, telegram_tag, nickname):
+        """
+        Масовий імпорт з CSV: titles — список {'title_name'; 'team_string'; 'chapter_numbers'};
+        Нові тайтли: на кожну таблицю один batch_update (аркуші); один values_batch_update (A2; шапка; розділи)
+        та один batch_update (валідація статусів); журнал — один запис outbox на весь імпорт;
+        Існуючим тайтлам оновлюється команда (A2); розділи додаються без дублікатів: одне читання аркушів;
+        один batch_update (insertDimension) на таблицю; значення — у тому ж values_batch_update;
+        """
+        if not self.spreadsheet: raise ConnectionError("Немає підключення до Google Sheets;")
+        try:
+            # Актуальна карта аркушів (тайтл міг бути створений поза ботом або попередньою спробою імпорту)
+            self._load_title_map()
+
+            new_by_shard = {}
+            existing_by_shard = {}
+            for entry in titles:
+                title_name = entry['title_name']
+                self._invalidate_title_data(title_name)
+                if title_name in self._worksheets:
+                    existing_by_shard.setdefault(self._title_shards[title_name], []).append(entry)
+                    continue
+                headers = generate_sheet_headers(include_beta=team_has_beta(entry['team_string']))
+                row_count = max(100, FIRST_DATA_ROW_INDEX + len(entry['chapter_numbers']))
+                shard_key = self._shard_for_new_title(title_name)
+                self._shard_cells[shard_key] = self._shard_cells.get(shard_key, 0) + row_count * len(headers)
+                new_by_shard.setdefault(shard_key, []).append((entry, SheetSchema(headers), row_count))
+
+            def apply(shard_key):
+                spreadsheet = self.shards[shard_key]
+                plans = new_by_shard.get(shard_key, [])
+                existing_entries = existing_by_shard.get(shard_key, [])
+                worksheets = []
+                if plans:
+                    response = spreadsheet.batch_update({'requests': [
+                        {'addSheet': {'properties': {
+                            'title': entry['title_name'],
+                            'sheetType': 'GRID',
+                            'gridProperties': {'rowCount': row_count, 'columnCount': len(schema.headers)},
+                        }}}
+                        for entry, schema, row_count in plans
+                    ]})
+                    worksheets = [gspread.Worksheet(spreadsheet, reply['addSheet']['properties']) for reply in response['replies']]
+
+                # Вміст: для нових аркушів A2 (команда); рядок 3 (шапка) та розділи; для існуючих — лише A2
+                data = [
+                    {'range': gspread.utils.absolute_range_name(entry['title_name'], 'A2'),
+                     'values': [[entry['team_string']], schema.headers] + [schema.new_chapter_row(c) for c in entry['chapter_numbers']]}
+                    for entry, schema, _ in plans
+                ]
+                data.extend(
+                    {'range': gspread.utils.absolute_range_name(entry['title_name'], 'A2'), 'values': [[entry['team_string']]]}
+                    for entry in existing_entries
+                )
+                # Розділи існуючих тайтлів: порожні рядки вставляються заздалегідь (успадковують форматування)
+                insert_requests, chapter_data, added, warnings = self._plan_import_chapters(shard_key, existing_entries)
+                if insert_requests:
+                    spreadsheet.batch_update({'requests': insert_requests})
+                data.extend(chapter_data)
+                spreadsheet.values_batch_update(body={'valueInputOption': 'USER_ENTERED', 'data': data})
+
+                validated = False
+                if worksheets:
+                    requests = []
+                    for (_, schema, _), worksheet in zip(plans, worksheets):
+                        requests.extend(status_validation_requests(worksheet.id, schema.headers))
+                    try:
+                        spreadsheet.batch_update({'requests': requests})
+                        validated = True
+                    except gspread.exceptions.APIError as e:
+                        # Валідацію буде встановлено при наступному додаванні розділу
+                        logger.error(f"Не вдалося встановити валідацію статусів для імпортованих тайтлів: {e}")
+                return worksheets, validated, added, warnings
+
+            shard_keys = list(dict.fromkeys(list(new_by_shard) + list(existing_by_shard)))
+            placements = []
+            added_chapters = {entry['title_name']: entry['chapter_numbers'] for entries in new_by_shard.values() for entry, _, _ in entries}
+            warnings = []
+            for shard_key, (worksheets, validated, added, shard_warnings) in zip(shard_keys, self._map_parallel(apply, shard_keys)):
+                added_chapters.update(added)
+                warnings.extend(shard_warnings)
+                for (entry, schema, _), worksheet in zip(new_by_shard.get(shard_key, []), worksheets):
+                    title_name = entry['title_name']
+                    self._worksheets[title_name] = worksheet
+                    self._title_shards[title_name] = shard_key
+                    self._schema(title_name, None, schema.headers)
+                    if validated:
+                        self._prepared_titles[title_name] = tuple(schema.headers)
+                    placements.append((title_name, shard_key))
+            if placements:
+                self.title_index.replace(self._worksheets)
+                self._record_title_shards(placements)
+
+            existing = [entry for entries in existing_by_shard.values() for entry in entries]
+            for entry in existing:
+                added_chapters.setdefault(entry['title_name'], [])
+
+            # Журнал: по одному рядку на тайтл; одним додаванням
+            action_time = self._action_time().strftime("%d.%m.%Y %H:%M:%S")
+            self._log_rows([
+                [action_time, telegram_tag, nickname, entry['title_name'],
+                 format_chapter_log(added_chapters[entry['title_name']]) if added_chapters[entry['title_name']] else "Команда",
+                 "Імпорт (CSV)"]
+                for entry in titles
+            ])
+
+            response_msg = (
+                f"✅ Імпортовано тайтлів: {len(titles)} (нових: {len(placements)}; оновлено: {len(existing)}); "
+                f"додано розділів: {sum(map(len, added_chapters.values()))};"
+            )
+            return "\n".join([response_msg] + warnings)
+        except Exception as e:
+            if _is_transient_sheets_error(e): raise # Повториться з outbox
+            logger.error(f"Помилка імпорту тайтлів: {e}")
+            return "❌ Сталася помилка при імпорті тайтлів;"
+
     # ЗМІНА 5: Оновлення get_status для фільтрації розділів
+    @traced()
     def get_status(self, title_name, chapter_numbers=None):
         """
         Отримує і форматує статус роботи над тайтлом;
@@ -389,113 +1645,400 @@ class SheetsHelper:
         """
         if not self.spreadsheet: return "Помилка підключення до таблиці;"
         try:
-            worksheet = self.spreadsheet.worksheet(title_name)
+            cached_status = self._cached_status(title_name, chapter_numbers)
+            if cached_status:
+                return cached_status
+            worksheet = self._worksheet(title_name)
             
             # Отримуємо заголовки та всі дані
-            all_values = worksheet.get_all_values()
-            if len(all_values) < 4:
-                # ВИПРАВЛЕННЯ: Використовуємо крапку з комою замість коми
-                return f"⚠️ Тайтл '{title_name}' не має розділів; Додайте їх за допомогою `/newchapter`;"
-            
-            headers = all_values[2] # Рядок 3
-            data_rows = all_values[3:] # Рядки з даними (після заголовків)
-            team_string = worksheet.acell('A2').value or 'Команда не встановлена' # Рядок 2
-
-            # Фільтрація рядків за номерами розділів
-            if chapter_numbers:
-                # Множина номерів розділів; які потрібно відобразити (у вигляді рядків)
-                target_chapters = {str(c) for c in chapter_numbers}
-                data_rows = [row for row in data_rows if row and row[0].strip() in target_chapters]
-                
-                if not data_rows:
-                    # ВИПРАВЛЕННЯ: Використовуємо крапку з комою замість коми
-                    return f"⚠️ Жодного з вказаних розділів ({'; '.join(map(str, chapter_numbers))}) для '{title_name}' не знайдено;"
-
-            # Визначаємо індекси колонок для Нік; Статус
-            col_indices = {}
-            role_names = []
-            
-            for i, header in enumerate(headers):
-                if header.endswith('-Нік'):
-                    role = header.replace('-Нік', '')
-                    col_indices[f'{role}-Нік'] = i
-                    role_names.append(role)
-                elif header.endswith('-Статус'):
-                    role = header.replace('-Статус', '')
-                    col_indices[f'{role}-Статус'] = i
-                    if role not in role_names:
-                        role_names.append(role)
-                
-            # Форматування виводу
-            status_message = [f"📊 *Статус Тайтлу: {title_name}*\n"]
-            status_message.append(f"👥 *Команда:*\n_{team_string}_\n")
-            
-            # Максимальна довжина номера розділу для вирівнювання
-            max_len_chapter = max(len(row[0]) for row in data_rows if row and row[0]) if data_rows else 0
-            
-            # Заголовок таблиці
-            header_line = f"`{'Розділ':<{max_len_chapter}}`"
-            for role in role_names:
-                header_line += f"|`{role[:5]:^5}`"
-            status_message.append(header_line)
-            
-            separator_line = f"`{'-' * max_len_chapter}`"
-            for _ in role_names:
-                separator_line += "|`-----`"
-            status_message.append(separator_line)
-            
-            # Рядки з даними
-            for row in data_rows:
-                if not row or not row[0].strip(): continue # Пропускаємо пусті рядки
-                
-                row_line = f"`{row[0]:<{max_len_chapter}}`"
-                for role in role_names:
-                    # Використовуємо індекс колонки статусу
-                    status_col_key = f'{role}-Статус'
-                    status_index = col_indices.get(status_col_key)
-                    
-                    status_char = row[status_index] if status_index is not None and status_index < len(row) else '?'
-                    # Символ: ✅ (виконано); ❌ (не виконано); ⏳ (у роботі); ❓ (відсутній)
-                    display_char = '✅' if status_char == '✅' else ('❌' if status_char == '❌' else '❓')
-                    
-                    # Нік (якщо є)
-                    nick_col_key = f'{role}-Нік'
-                    nick_index = col_indices.get(nick_col_key)
-                    
-                    # Логіка для ⏳ (У роботі): Якщо статус ❌; але нік є -> ⏳
-                    # Для 'Публікація' nick_index буде None; тому nick буде '' і ⏳ не покажеться;
-                    nick = row[nick_index].strip() if nick_index is not None and nick_index < len(row) else ''
-                    if status_char == '❌' and nick:
-                        display_char = '⏳'
-                    
-                    row_line += f"|`{display_char:^5}`"
-                    
-                status_message.append(row_line)
-
-            # Ліміт на вивід: 50 останніх розділів + заголовок (тільки якщо не було вказано конкретний діапазон)
-            if not chapter_numbers and len(status_message) > 53:
-                status_message = status_message[:3] + ["..."] + status_message[-50:]
-            
-            return "\n".join(status_message)
+            return self._render_status(title_name, worksheet.get_all_values(), chapter_numbers)
             
         except gspread.WorksheetNotFound:
             # ВИПРАВЛЕННЯ: Використовуємо крапку з комою замість коми
-            return f"⚠️ Тайтл '{title_name}' не знайдено; Перевірте назву або створіть його за допомогою `/team`;"
+            return self._title_not_found(title_name, " Перевірте назву або створіть його за допомогою `/team`;")
         except Exception as e:
             logger.error(f"Помилка отримання статусу: {e}")
             return "❌ Сталася помилка при отриманні статусу;"
 
+    @traced()
+    def get_statuses(self, title_names, chapter_numbers=None):
+        """
+        Статуси кількох тайтлів (список повідомлень у тому ж порядку);
+        Аркуші читаються одним values_batch_get на таблицю; таблиці — паралельно; тож час ≈ найповільніша таблиця;
+        """
+        if len(title_names) == 1:
+            return [self.get_status(title_names[0], chapter_numbers)]
+        if not self.spreadsheet: return ["Помилка підключення до таблиці;"]
+
+        # Тайтли зі знімка кешу (теплий старт) відповідають без читання таблиці
+        cached = {title_name: self._cached_status(title_name, chapter_numbers) for title_name in title_names}
+        if all(cached.values()):
+            return [cached[title_name] for title_name in title_names]
+        uncached = [title_name for title_name in title_names if not cached[title_name]]
 
+        def resolve(title_name):
+            try:
+                self._worksheet(title_name)
+                return True
+            except gspread.WorksheetNotFound:
+                return False
+            except Exception as e:
+                logger.error(f"Помилка пошуку аркуша '{title_name}': {e}")
+                return None
+
+        # Невідомі аркуші шукаються паралельно (відомі беруться з карти без запитів)
+        found = dict(zip(uncached, self._map_parallel(resolve, uncached)))
+        titles_by_shard = {}
+        for title_name in uncached:
+            if found[title_name]:
+                titles_by_shard.setdefault(self._title_shards[title_name], []).append(title_name)
+
+        def fetch(shard_key):
+            try:
+                return self._fetch_shard_values(shard_key, titles_by_shard[shard_key])
+            except Exception as e:
+                logger.error(f"Помилка пакетного читання тайтлів: {e}")
+                return {}
+
+        values_by_title = {}
+        for fetched in self._map_parallel(fetch, titles_by_shard):
+            values_by_title.update(fetched)
+
+        statuses = []
+        for title_name in title_names:
+            values = values_by_title.get(title_name)
+            if cached[title_name]:
+                statuses.append(cached[title_name])
+            elif found[title_name] is False:
+                statuses.append(self._title_not_found(title_name, " Перевірте назву або створіть його за допомогою `/team`;"))
+            elif values is None:
+                statuses.append(f"❌ Сталася помилка при отриманні статусу '{title_name}';")
+            else:
+                try:
+                    statuses.append(self._render_status(title_name, values, chapter_numbers))
+                except Exception as e:
+                    logger.error(f"Помилка отримання статусу: {e}")
+                    statuses.append(f"❌ Сталася помилка при отриманні статусу '{title_name}';")
+        return statuses
+
+    def _render_status(self, title_name, all_values, chapter_numbers=None):
+        """Форматує статус тайтлу з уже прочитаних значень аркуша (оновлює in-memory TitleData);"""
+        if len(all_values) < 4:
+            # ВИПРАВЛЕННЯ: Використовуємо крапку з комою замість коми
+            return f"⚠️ Тайтл '{title_name}' не має розділів; Додайте їх за допомогою `/newchapter`;"
+        
+        # Схема перекомпілюється лише якщо рядок 3 змінився
+        schema = self._schema(title_name, None, all_values[2])
+        title_data = TitleData.from_values(all_values, schema, self._nick_table)
+        self._title_data[title_name] = title_data
+        self._snapshot_titles.discard(title_name)
+        return self._format_status(title_name, title_data, chapter_numbers)
+
+    def _cached_status(self, title_name, chapter_numbers=None):
+        """Статус з даних знімка кешу (до фонової перевірки) з позначкою часу даних; None — треба читати таблицю;"""
+        title_data = self._title_data.get(title_name) if title_name in self._snapshot_titles else None
+        if title_data is None or time.time() - title_data.fetched_at > CACHE_SNAPSHOT_MAX_AGE:
+            return None
+        fetched_at = datetime.fromtimestamp(title_data.fetched_at).strftime("%d.%m.%Y %H:%M")
+        return self._format_status(title_name, title_data, chapter_numbers) + f"\n\n_🕒 Дані станом на {fetched_at}; оновлюються у фоні;_"
+
+    def _format_status(self, title_name, title_data, chapter_numbers=None):
+        """Форматує статус тайтлу з TitleData;"""
+        if not len(title_data):
+            return f"⚠️ Тайтл '{title_name}' не має розділів; Додайте їх за допомогою `/newchapter`;"
+        team_string = title_data.team or 'Команда не встановлена' # Рядок 2
+        data_rows = list(title_data.rows()) # Рядки з даними (після заголовків)
+
+        # Фільтрація рядків за номерами розділів
+        if chapter_numbers:
+            # Множина номерів розділів; які потрібно відобразити (у вигляді рядків)
+            target_chapters = {str(c) for c in chapter_numbers}
+            data_rows = [row for row in data_rows if row.label in target_chapters]
+            
+            if not data_rows:
+                # ВИПРАВЛЕННЯ: Використовуємо крапку з комою замість коми
+                return f"⚠️ Жодного з вказаних розділів ({'; '.join(map(str, chapter_numbers))}) для '{title_name}' не знайдено;"
+
+        # Форматування виводу
+        status_message = [f"📊 *Статус Тайтлу: {title_name}*\n"]
+        status_message.append(f"👥 *Команда:*\n_{team_string}_\n")
+        
+        # Максимальна довжина номера розділу для вирівнювання
+        labels = [row.label for row in data_rows]
+        max_len_chapter = max(map(len, labels)) if labels else 0
+        
+        # Заголовок таблиці
+        header_line = f"`{'Розділ':<{max_len_chapter}}`"
+        for role in title_data.roles:
+            header_line += f"|`{role[:5]:^5}`"
+        status_message.append(header_line)
+        
+        separator_line = f"`{'-' * max_len_chapter}`"
+        for _ in title_data.roles:
+            separator_line += "|`-----`"
+        status_message.append(separator_line)
+        
+        # Рядки з даними
+        for row, label in zip(data_rows, labels):
+            row_line = f"`{label:<{max_len_chapter}}`"
+            for position in range(len(title_data.roles)):
+                # Символ: ✅ (виконано); ❌ (не виконано); ⏳ (у роботі); ❓ (відсутній)
+                status_code = row.status_code(position)
+                display_char = STATUS_DISPLAY.get(status_code, '❓')
+                
+                # Логіка для ⏳ (У роботі): Якщо статус ❌; але нік є -> ⏳
+                # Для 'Публікація' колонки Нік немає; тож ⏳ не покажеться;
+                if status_code == STATUS_CODES['❌'] and row.nick(position):
+                    display_char = '⏳'
+                
+                row_line += f"|`{display_char:^5}`"
+                
+            status_message.append(row_line)
+
+        # Ліміт на вивід: 50 останніх розділів + заголовок (тільки якщо не було вказано конкретний діапазон)
+        if not chapter_numbers and len(status_message) > 53:
+            status_message = status_message[:3] + ["..."] + status_message[-50:]
+        
+        return "\n".join(status_message)
+
+
+    @traced()
+    def export_title(self, title_name, chapter_numbers=None, export_format='csv'):
+        """
+        Експортує всі розділи тайтлу (ніки; дати; статуси) у файл одним читанням аркуша;
+        Повертає (файл; None) або (None; повідомлення про помилку);
+        """
+        if not self.spreadsheet: return None, "Помилка підключення до таблиці;"
+        try:
+            all_values = self._worksheet(title_name).get_all_values()
+            if len(all_values) < 4:
+                return None, f"⚠️ Тайтл '{title_name}' не має розділів; Додайте їх за допомогою `/newchapter`;"
+
+            headers = all_values[2] # Рядок 3
+            target_chapters = {str(c) for c in chapter_numbers} if chapter_numbers else None
+
+            def export_rows():
+                yield headers
+                for row in all_values[3:]:
+                    if not row or not row[0].strip():
+                        continue
+                    chapter = row[0].strip().lstrip("'")
+                    if target_chapters is not None and chapter not in target_chapters:
+                        continue
+                    yield [chapter] + row[1:]
+
+            export_file = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_SIZE)
+            if export_format == 'xlsx':
+                write_xlsx(export_rows(), export_file, title_name)
+            else:
+                for chunk in iter_csv_chunks(export_rows()):
+                    export_file.write(chunk)
+            export_file.seek(0)
+            return export_file, None
+
+        except gspread.WorksheetNotFound:
+            return None, self._title_not_found(title_name, " Перевірте назву або створіть його за допомогою `/team`;")
+        except Exception as e:
+            logger.error(f"Помилка експорту тайтлу: {e}")
+            return None, "❌ Сталася помилка при експорті тайтлу;"
+
+    def _fetch_shard_values(self, shard_key, titles):
+        """Значення аркушів кількох тайтлів однієї таблиці: один values_batch_get на BATCH_GET_MAX_RANGES тайтлів;"""
+        fetched = {}
+        for start in range(0, len(titles), BATCH_GET_MAX_RANGES):
+            chunk = titles[start:start + BATCH_GET_MAX_RANGES]
+            response = self.shards[shard_key].values_batch_get([gspread.utils.absolute_range_name(t) for t in chunk])
+            for title_name, value_range in zip(chunk, response.get('valueRanges', [])):
+                # Вирівнюємо рядки до однакової довжини; як get_all_values
+                fetched[title_name] = gspread.utils.fill_gaps(value_range.get('values', []))
+        return fetched
+
+    def refresh_title_data(self, reload_title_map=False):
+        """
+        Оновлює in-memory дані всіх тайтлів та довідник користувачів;
+        Один values_batch_get на таблицю (до BATCH_GET_MAX_RANGES тайтлів); таблиці читаються паралельно;
+        reload_title_map: спершу перечитати карту аркушів (тайтли; створені редакторами або іншими репліками);
+        """
+        if not self.spreadsheet: raise ConnectionError("Немає підключення до Google Sheets;")
+        if reload_title_map:
+            self._load_title_map()
+        titles_by_shard = {}
+        # Копії: outbox і читання статусів (інші потоки) додають та видаляють тайтли під час оновлення
+        for title_name in list(self._worksheets):
+            shard_key = self._title_shards.get(title_name)
+            if shard_key in self.shards:
+                titles_by_shard.setdefault(shard_key, []).append(title_name)
+
+        fetched_at = time.time()
+        changed = 0
+        for fetched in self._map_parallel(lambda shard_key: self._fetch_shard_values(shard_key, titles_by_shard[shard_key]), titles_by_shard):
+            for title_name, values in fetched.items():
+                previous = self._title_data.get(title_name)
+                if len(values) < 3:
+                    self._title_data.pop(title_name, None) # Аркуш без заголовків (розділів ще немає)
+                    changed += previous is not None
+                    continue
+                schema = self._schema(title_name, None, values[2])
+                fingerprint = values_fingerprint(values)
+                if previous is not None and previous.fingerprint == fingerprint and previous.schema is schema:
+                    previous.fetched_at = fetched_at # Аркуш не змінився: дані лише підтверджуються
+                    continue
+                try:
+                    self._title_data[title_name] = TitleData.from_values(values, schema, self._nick_table, fetched_at, fingerprint)
+                except Exception as e:
+                    # Один некоректний аркуш не зупиняє оновлення інших; тайтл читатиметься з таблиці напряму
+                    logger.error(f"Не вдалося розібрати дані тайтлу '{title_name}': {e}")
+                    self._title_data.pop(title_name, None)
+                changed += 1
+        # Дані всіх тайтлів звірено з таблицями; видалені аркуші забуваються
+        for title_name in [t for t in list(self._title_data) if t not in self._worksheets]:
+            self._title_data.pop(title_name, None)
+        self._snapshot_titles.clear()
+
+        # Довідник користувачів: Telegram-ID; Теґ; Нік (дані з 4-го рядка)
+        if self.users_sheet:
+            self._users = {
+                row[0].strip(): (row[1].strip() if len(row) > 1 else '', row[2].strip() if len(row) > 2 else '')
+                for row in self.users_sheet.get_all_values()[3:]
+                if row and row[0].strip()
+            }
+        return changed
+
+    def _restore_snapshot(self, snapshot):
+        """Відновлює карту аркушів; користувачів і дані тайтлів зі знімка кешу без запитів до таблиць;"""
+        try:
+            service = {title: gspread.Worksheet(self.spreadsheet, properties) for title, properties in snapshot['service_sheets'].items()}
+            worksheets = {
+                title: gspread.Worksheet(self.shards[shard_key], properties)
+                for title, (shard_key, properties) in snapshot['worksheets'].items()
+            }
+            nick_ids = [self._nick_table.intern(nick) for nick in snapshot['nicks']]
+            title_data = {}
+            for title_name, state in snapshot['titles'].items():
+                schema = self._schema(title_name, None, state[0])
+                title_data[title_name] = TitleData.from_snapshot(state, schema, self._nick_table, nick_ids)
+        except Exception as e:
+            logger.warning(f"Знімок кешу не відновлено; читаємо таблиці: {e}")
+            return False
+
+        self.log_sheet = service.get("Журнал")
+        self.users_sheet = service.get("Користувачі")
+        self.shards_sheet = service.get(SHARDS_SHEET_TITLE)
+        self._worksheets = worksheets
+        self.title_index.replace(worksheets)
+        self._title_shards = snapshot['title_shards']
+        self._mapped_titles = set(snapshot['mapped_titles'])
+        self._shard_cells = snapshot['shard_cells']
+        self._users = snapshot['users']
+        self._title_data = title_data
+        self._snapshot_titles = set(title_data)
+        self.restored_from_snapshot = True
+        age = time.time() - snapshot['saved_at']
+        logger.info(f"Відновлено знімок кешу ({age:.0f} с тому): {len(worksheets)} тайтлів; дані {len(title_data)} тайтлів;")
+        return True
+
+    @traced()
+    def validate_snapshot(self):
+        """
+        Фонова перевірка після старту: карта аркушів (якщо взята зі знімка); пакетне читання тайтлів; новий знімок;
+        Після холодного старту лише заповнює дані тайтлів; щоб наступний знімок був повним;
+        """
+        if self.restored_from_snapshot:
+            self._initialize_sheets()
+            self._load_title_map()
+        restored = len(self._snapshot_titles)
+        changed = self.refresh_title_data()
+        logger.info(f"Кеш звірено з таблицями: змінилося аркушів {changed}; відповідало зі знімка тайтлів {restored};")
+        self.save_snapshot()
+
+    def save_snapshot(self):
+        """Зберігає стан кешу у файл (pickle + zlib; атомарна заміна); дані; змінені ботом після читання; не зберігаються;"""
+        if not self.snapshot_file or not self.spreadsheet:
+            return
+        started = time.perf_counter()
+        service_sheets = {sheet.title: worksheet_properties(sheet) for sheet in (self.log_sheet, self.users_sheet, self.shards_sheet) if sheet}
+        snapshot = {
+            'version': CACHE_SNAPSHOT_VERSION,
+            'shard_keys': self.shard_keys,
+            'saved_at': time.time(),
+            'service_sheets': service_sheets,
+            'worksheets': {
+                title: (self._title_shards[title], worksheet_properties(worksheet))
+                for title, worksheet in list(self._worksheets.items()) if title in self._title_shards
+            },
+            'title_shards': dict(self._title_shards),
+            'mapped_titles': list(self._mapped_titles),
+            'shard_cells': dict(self._shard_cells),
+            'users': dict(self._users),
+            'nicks': list(self._nick_table),
+            'titles': {title: data.to_snapshot() for title, data in list(self._title_data.items())},
+        }
+        data = zlib.compress(pickle.dumps(snapshot, protocol=pickle.HIGHEST_PROTOCOL))
+        temp_path = f"{self.snapshot_file}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.snapshot_file)
+        logger.debug(f"Знімок кешу збережено: {len(data)} Б; {len(snapshot['titles'])} тайтлів; {(time.perf_counter() - started) * 1000:.0f} мс")
+
+    def user_ids_by_nickname(self):
+        """Нік або Теґ (у нижньому регістрі) -> список Telegram-ID зареєстрованих користувачів;"""
+        user_ids = {}
+        for user_id, (telegram_tag, nickname) in self._users.items():
+            for name in {telegram_tag.lower(), nickname.lower()} - {''}:
+                user_ids.setdefault(name, []).append(user_id)
+        return user_ids
+
+    def find_stale_tasks(self, today, stale_days, first_seen):
+        """
+        Знаходить завислі завдання (нік є; статус ❌) лише за in-memory даними (без запитів до таблиці);
+        Початок роботи: власна дата ролі; інакше остання дата попередніх ролей у рядку
+        (коли розділ став доступним); інакше день; коли завдання вперше помічено (first_seen);
+        """
+        stale_tasks = []
+        active_keys = set()
+        not_done = STATUS_CODES['❌']
+        for title_name, title_data in list(self._title_data.items()):
+            for row in title_data.rows():
+                chapter = row.label
+                previous_date = None
+                for position, role in enumerate(title_data.roles):
+                    role_date = row.date(position)
+                    nickname = row.nick(position)
+                    if nickname and row.status_code(position) == not_done:
+                        key = (title_name, chapter, role)
+                        active_keys.add(key)
+                        started = role_date or previous_date or first_seen.setdefault(key, today)
+                        days = (today - started).days
+                        if days >= stale_days:
+                            stale_tasks.append(StaleTask(title_name, chapter, role, nickname, days))
+                    if role_date and (previous_date is None or role_date > previous_date):
+                        previous_date = role_date
+
+        # Забуваємо завдання; які вже виконано або знято
+        for key in set(first_seen) - active_keys:
+            del first_seen[key]
+        return stale_tasks
+
+    @traced()
     def update_chapter_status(self, title_name, chapter_number, role_name, status_char, nickname, telegram_tag):
         """Оновлює статус; дату та нік в таблиці для вказаного розділу та ролі;"""
-        if not self.spreadsheet: return "Помилка підключення до таблиці;"
+        if not self.spreadsheet: raise ConnectionError("Немає підключення до Google Sheets;")
         
         try:
-            worksheet = self.spreadsheet.worksheet(title_name)
-            headers = worksheet.row_values(3)
+            worksheet = self._worksheet(title_name)
+            self._invalidate_title_data(title_name)
             
+            # Колонка A (номери розділів) та рядок 3 (заголовки) одним запитом: схема звіряється перед кожним записом
+            column_range, header_range = worksheet.spreadsheet.values_batch_get(
+                [gspread.utils.absolute_range_name(title_name, 'A:A'), gspread.utils.absolute_range_name(title_name, '3:3')],
+                params={'valueRenderOption': 'FORMATTED_VALUE'},
+            )['valueRanges']
+            chapter_cells = [row[0] if row else '' for row in column_range.get('values', [])][3:] # З 4-го рядка
+            headers = (header_range.get('values') or [[]])[0]
+
             # Знаходимо індекс рядка розділу (починаємо з 4-го рядка)
-            chapter_cells = worksheet.col_values(1, value_render_option='FORMATTED_VALUE')[3:] # З 4-го рядка
             try:
                 row_index = chapter_cells.index(str(chapter_number)) + 4 # +4 тому; що рядок 1; 2; 3 пропущені; 
             except ValueError:
@@ -512,25 +2055,25 @@ class SheetsHelper:
                 # ВИПРАВЛЕННЯ: Використовуємо крапку з комою замість коми
                 return f"⚠️ Невідома роль: {role_name}; Доступні: {'; '.join(ROLE_TO_COLUMN_BASE.keys())}; бета; публікація;"
 
-            # Знаходимо індекси колонок для Нік; Дата; Статус
-            
-            if role_key == PUBLISH_COLUMN_BASE:
-                try:
-                    # ОНОВЛЕНО: Публікація має 2 колонки: Дата та Статус (Нік відсутній)
-                    date_col_index = headers.index(f'{PUBLISH_COLUMN_BASE}-Дата') + 1
-                    status_col_index = headers.index(f'{PUBLISH_COLUMN_BASE}-Статус') + 1
-                    nick_col_index = None # Нік для публікації не використовується
-                except ValueError:
+            # Знаходимо індекси колонок для Нік; Дата; Статус (схема перекомпілюється; якщо рядок 3 змінився)
+            def role_columns_complete(columns):
+                if columns is None or columns[1] is None or columns[2] is None:
+                    return False
+                # ОНОВЛЕНО: Публікація має 2 колонки: Дата та Статус (Нік відсутній)
+                return role_key == PUBLISH_COLUMN_BASE or columns[0] is not None
+
+            columns = self._schema(title_name, worksheet, headers).columns(role_key)
+            if not role_columns_complete(columns):
+                if role_key == PUBLISH_COLUMN_BASE:
                     # ВИПРАВЛЕННЯ: Використовуємо крапку з комою замість коми
                     return "❌ Помилка: Невірний формат заголовків аркуша тайтлу (Публікація-Дата або Публікація-Статус відсутні);"
-            else:
-                try:
-                    nick_col_index = headers.index(f'{role_key}-Нік') + 1
-                    date_col_index = headers.index(f'{role_key}-Дата') + 1
-                    status_col_index = headers.index(f'{role_key}-Статус') + 1
-                except ValueError:
-                    # ВИПРАВЛЕННЯ: Використовуємо крапку з комою замість коми
-                    return f"❌ Помилка: Колонка для ролі '{role_key}' не знайдена в заголовках; Можливо, ви не встановили бету."
+                # ВИПРАВЛЕННЯ: Використовуємо крапку з комою замість коми
+                return f"❌ Помилка: Колонка для ролі '{role_key}' не знайдена в заголовках; Можливо, ви не встановили бету."
+
+            # Індекси клітинок у gspread починаються з 1
+            nick_col_index = columns[0] + 1 if role_key != PUBLISH_COLUMN_BASE else None # Нік для публікації не використовується
+            date_col_index = columns[1] + 1
+            status_col_index = columns[2] + 1
 
 
             # 1. Оновлення статусу (завжди)
@@ -543,7 +2086,7 @@ class SheetsHelper:
                 
                 # 2. Оновлення Дати (тільки для + або -)
                 if status_char == '+':
-                    current_date = datetime.now().strftime("%d.%m.%Y")
+                    current_date = self._action_time().strftime("%d.%m.%Y")
                     worksheet.update_cell(row_index, date_col_index, current_date)
                 elif status_char == '-':
                     # Прибираємо дату при відміні
@@ -555,7 +2098,7 @@ class SheetsHelper:
                 
                 # 2. Оновлення Ніка та Дати (тільки для + або -)
                 if status_char == '+':
-                    current_date = datetime.now().strftime("%d.%m.%Y")
+                    current_date = self._action_time().strftime("%d.%m.%Y")
                     worksheet.update_cell(row_index, nick_col_index, nickname)
                     worksheet.update_cell(row_index, date_col_index, current_date)
                 elif status_char == '-':
@@ -578,13 +2121,367 @@ class SheetsHelper:
             return f"✅ Статус {role_key} для розділу {chapter_number} у тайтлі {title_name} {action};"
             
         except gspread.WorksheetNotFound:
-            return f"⚠️ Тайтл '{title_name}' не знайдено;"
+            return self._title_not_found(title_name)
         except Exception as e:
+            if _is_transient_sheets_error(e): raise # Повториться з outbox
             logger.error(f"Помилка оновлення статусу: {e}")
             return "❌ Сталася помилка при оновленні статусу;"
-    
+
+    @traced()
+    def _apply_update_status(self, title_name, chapter_number, role_name, status_char, telegram_tag, user_id, fallback_nickname, nickname=None):
+        """Операція outbox 'update_status': нік визначається під час застосування (без читання таблиці в обробнику);"""
+        if not nickname:
+            # Нік не вказано; шукаємо зареєстрований; якщо його немає — беремо з Telegram-профілю
+            nickname = self.get_nickname_by_id(user_id) or fallback_nickname
+        return self.update_chapter_status(title_name, chapter_number, role_name, status_char, nickname, telegram_tag)
+
+# --- Збереження стану між перезапусками та репліками ---
+
+class BotData(dict):
+    """
+    bot_data; з якого при збереженні (deepcopy) виключаються об'єкти процесу;
+    Клієнт Google Sheets та outbox локальні для кожної репліки і не серіалізуються;
+    """
+    RUNTIME_KEYS = {'sheets_helper', 'outbox'}
+
+    def __deepcopy__(self, memo):
+        return {key: deepcopy(value, memo) for key, value in self.items() if key not in self.RUNTIME_KEYS}
+
+class FilePersistence(PicklePersistence):
+    """Локальне файлове сховище стану (одна репліка);"""
+    async def get_bot_data(self):
+        return BotData(await super().get_bot_data())
+
+class RedisPersistence(BasePersistence):
+    """
+    Спільне сховище стану в Redis: репліки бачать user/chat/bot data одна одної;
+    bot_data зберігається по ключах (hash): репліка записує лише ключі; які змінила сама;
+    тож бездіяльна репліка не перезаписує зміни активної своєю застарілою копією;
+    """
+    def __init__(self, redis_client, prefix=REDIS_PREFIX, update_interval=PERSISTENCE_UPDATE_INTERVAL):
+        super().__init__(store_data=PersistenceInput(callback_data=False), update_interval=update_interval)
+        self.redis = redis_client
+        self.prefix = prefix
+        self._bot_data_synced = {} # ключ bot_data -> pickle останньої прочитаної/записаної версії
+
+    def _key(self, name):
+        return f"{self.prefix}:{name}"
+
+    async def _load_hash(self, name):
+        raw = await self.redis.hgetall(self._key(name))
+        return {int(field): pickle.loads(value) for field, value in raw.items()}
+
+    async def _refresh_from_hash(self, name, field, data):
+        # Стан могла змінити інша репліка; беремо актуальну версію зі сховища
+        raw = await self.redis.hget(self._key(name), field)
+        if raw is not None:
+            data.clear()
+            data.update(pickle.loads(raw))
+
+    async def get_user_data(self):
+        return await self._load_hash('user_data')
+
+    async def get_chat_data(self):
+        return await self._load_hash('chat_data')
+
+    async def get_bot_data(self):
+        raw = await self.redis.hgetall(self._key('bot_data_keys'))
+        if not raw:
+            # Попередній формат: увесь bot_data одним значенням; перейде в hash при першому збереженні
+            legacy = await self.redis.get(self._key('bot_data'))
+            return BotData(pickle.loads(legacy) if legacy else {})
+        self._bot_data_synced = {field.decode() if isinstance(field, bytes) else field: value for field, value in raw.items()}
+        return BotData({key: pickle.loads(value) for key, value in self._bot_data_synced.items()})
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name):
+        raw = await self.redis.hgetall(self._key(f'conversations:{name}'))
+        return {tuple(json.loads(field)): pickle.loads(value) for field, value in raw.items()}
+
+    async def update_conversation(self, name, key, new_state):
+        hash_key = self._key(f'conversations:{name}')
+        field = json.dumps(list(key))
+        if new_state is None:
+            await self.redis.hdel(hash_key, field)
+        else:
+            await self.redis.hset(hash_key, field, pickle.dumps(new_state))
+
+    async def update_user_data(self, user_id, data):
+        await self.redis.hset(self._key('user_data'), user_id, pickle.dumps(data))
+
+    async def update_chat_data(self, chat_id, data):
+        await self.redis.hset(self._key('chat_data'), chat_id, pickle.dumps(data))
+
+    async def update_bot_data(self, data):
+        changed = {}
+        for key, value in data.items():
+            raw = pickle.dumps(value)
+            if self._bot_data_synced.get(key) != raw:
+                changed[key] = raw
+        removed = [key for key in self._bot_data_synced if key not in data]
+        if changed:
+            await self.redis.hset(self._key('bot_data_keys'), mapping=changed)
+            self._bot_data_synced.update(changed)
+        if removed:
+            await self.redis.hdel(self._key('bot_data_keys'), *removed)
+            for key in removed:
+                del self._bot_data_synced[key]
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def drop_user_data(self, user_id):
+        await self.redis.hdel(self._key('user_data'), user_id)
+
+    async def drop_chat_data(self, chat_id):
+        await self.redis.hdel(self._key('chat_data'), chat_id)
+
+    async def refresh_user_data(self, user_id, user_data):
+        await self._refresh_from_hash('user_data', user_id, user_data)
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        await self._refresh_from_hash('chat_data', chat_id, chat_data)
+
+    async def refresh_bot_data(self, bot_data):
+        raw = await self.redis.hgetall(self._key('bot_data_keys'))
+        for field, value in raw.items():
+            key = field.decode() if isinstance(field, bytes) else field
+            synced = self._bot_data_synced.get(key)
+            if synced == value:
+                continue
+            # Ключ; змінений локально і ще не записаний; не перезаписуємо — його збереже update_bot_data
+            if key in bot_data and synced is not None and pickle.dumps(bot_data[key]) != synced:
+                continue
+            bot_data[key] = pickle.loads(value)
+            self._bot_data_synced[key] = value
+
+    async def flush(self):
+        await self.redis.aclose()
+
+class UpdateDeduplicator:
+    """Відкидає повторні доставки одного оновлення; з Redis ключ спільний для всіх реплік;"""
+    def __init__(self, redis_client=None, prefix=REDIS_PREFIX, ttl=UPDATE_DEDUP_TTL, max_local=10000):
+        self.redis = redis_client
+        self.prefix = prefix
+        self.ttl = ttl
+        self.max_local = max_local
+        self._seen = OrderedDict()
+
+    async def is_duplicate(self, update_id):
+        if self.redis is not None:
+            # SET NX: лише перша репліка; що отримала оновлення; його обробляє
+            return not await self.redis.set(f"{self.prefix}:update:{update_id}", 1, nx=True, ex=self.ttl)
+        if update_id in self._seen:
+            return True
+        self._seen[update_id] = True
+        if len(self._seen) > self.max_local:
+            self._seen.popitem(last=False)
+        return False
+
+def build_persistence(context_types):
+    """Обирає сховище стану: Redis (якщо задано REDIS_URL) або локальний файл;"""
+    if REDIS_URL:
+        if redis_asyncio is not None:
+            return RedisPersistence(redis_asyncio.from_url(REDIS_URL))
+        logger.error("REDIS_URL встановлено; але пакет redis не встановлено; Використовується локальний файл;")
+    return FilePersistence(PERSISTENCE_FILE, context_types=context_types, update_interval=PERSISTENCE_UPDATE_INTERVAL)
+
+# --- Воркер outbox ---
+
+async def outbox_worker(application):
+    """Фоново застосовує операції з outbox до Google Sheets (по черзі; з повторами при недоступності);"""
+    outbox = application.bot_data['outbox']
+    sheets = application.bot_data['sheets_helper']
+    outbox.wakeup = asyncio.Event()
+
+    while True:
+        outbox.wakeup.clear()
+
+        if not sheets.spreadsheet:
+            await asyncio.to_thread(sheets.connect)
+
+        sheets_available = bool(sheets.spreadsheet)
+        if sheets_available:
+            for entry in outbox.pending():
+                # Операція продовжує трасу оновлення; з якого виникла (той самий trace_id)
+                trace_ref = entry.get('trace') if TRACE_UPDATES else None
+                trace = Trace(f"outbox {entry['op']}", trace_ref['id'], trace_ref['origin']) if trace_ref else None
+                token = _current_trace.set(trace)
+                try:
+                    try:
+                        with trace_span('apply'):
+                            response = await asyncio.to_thread(sheets.apply_outbox_entry, entry)
+                    except Exception as e:
+                        if _is_transient_sheets_error(e):
+                            logger.warning(f"Outbox: Google Sheets недоступні ({e}); повтор через {OUTBOX_RETRY_SECONDS} с;")
+                            sheets_available = False
+                            break
+                        logger.error(f"Outbox: операцію {entry['op']} ({entry['id']}) відхилено: {e}")
+                        response = "❌ Сталася помилка під час внесення змін до таблиці;"
+
+                    outbox.mark_done(entry['id'])
+
+                    # Надсилаємо користувачу фактичний результат операції
+                    if entry.get('chat_id') and response:
+                        try:
+                            await application.bot.send_message(entry['chat_id'], response, parse_mode=entry.get('parse_mode'))
+                        except Exception as e:
+                            logger.error(f"Outbox: не вдалося надіслати результат у чат {entry['chat_id']}: {e}")
+                finally:
+                    _current_trace.reset(token)
+                    if trace:
+                        trace.finish()
+
+        # Операції; додані під час застосування (записи журналу); обробляємо одразу
+        if sheets_available and outbox.pending():
+            continue
+
+        # Чекаємо на нову операцію або на наступну спробу
+        try:
+            await asyncio.wait_for(outbox.wakeup.wait(), timeout=OUTBOX_RETRY_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+# --- Нагадування про завислі завдання ---
+
+def split_message(lines, limit=MESSAGE_LIMIT):
+    """Розбиває рядки на повідомлення; що не перевищують ліміт Telegram;"""
+    messages = []
+    current = []
+    current_len = 0
+    for line in lines:
+        if current and current_len + len(line) + 1 > limit:
+            messages.append("\n".join(current))
+            current = []
+            current_len = 0
+        current.append(line)
+        current_len += len(line) + 1
+    if current:
+        messages.append("\n".join(current))
+    return messages
+
+def format_stale_tasks(header, stale_tasks, with_nickname=True):
+    """Рядки повідомлення зі списком завислих завдань (найстаріші першими);"""
+    lines = [header]
+    for task in sorted(stale_tasks, key=lambda t: (-t.days, t.title, t.chapter)):
+        assignee = f" — {task.nickname}" if with_nickname else ""
+        lines.append(f"⏳ {task.title}; розділ {task.chapter}; {task.role}{assignee} ({task.days} дн;)")
+    return lines
+
+def daily_run_key(name, day):
+    """Ключ Redis; яким репліка закріплює за собою щоденну задачу;"""
+    return f"{REDIS_PREFIX}:daily:{name}:{day.isoformat()}"
+
+async def stale_tasks_job(context: ContextTypes.DEFAULT_TYPE):
+    """Щоденно: одне пакетне читання всіх тайтлів; особисті нагадування виконавцям і дайджест у чат команди;"""
+    application = context.application
+    sheets = application.bot_data['sheets_helper']
+    if not sheets.spreadsheet:
+        logger.warning("Нагадування пропущено: немає підключення до Google Sheets;")
+        return
+
+    # Кілька реплік (спільний Redis): нагадування надсилає лише та; що першою закріпила день (SET NX)
+    persistence = application.persistence
+    redis_client = persistence.redis if isinstance(persistence, RedisPersistence) else None
+    run_key = daily_run_key('stale_tasks', datetime.now().date())
+    if redis_client is not None and not await redis_client.set(run_key, 1, nx=True, ex=2 * 24 * 3600):
+        logger.info("Нагадування сьогодні вже надсилає інша репліка;")
+        return
+
+    try:
+        await asyncio.to_thread(sheets.refresh_title_data, reload_title_map=True)
+    except Exception as e:
+        logger.error(f"Не вдалося оновити дані тайтлів для нагадувань: {e}")
+        if redis_client is not None:
+            await redis_client.delete(run_key) # День не відпрацьовано: знімаємо позначку
+        context.job_queue.run_once(stale_tasks_job, when=REMINDER_RETRY_INTERVAL, name='stale_tasks_retry')
+        return
+
+    # Дні першого помічення завдань без дат зберігаються в bot_data (переживають перезапуск)
+    first_seen = application.bot_data.setdefault('task_first_seen', {})
+    stale_tasks = sheets.find_stale_tasks(datetime.now().date(), REMINDER_STALE_DAYS, first_seen)
+    if not stale_tasks:
+        return
+
+    # Особисті нагадування зареєстрованим виконавцям
+    user_ids = sheets.user_ids_by_nickname()
+    tasks_by_user = {}
+    for task in stale_tasks:
+        for user_id in user_ids.get(task.nickname.lower(), []):
+            tasks_by_user.setdefault(user_id, []).append(task)
+
+    for user_id, user_tasks in tasks_by_user.items():
+        lines = format_stale_tasks("⏰ Нагадування: ці завдання чекають на вас;", user_tasks, with_nickname=False)
+        for message in split_message(lines):
+            try:
+                await application.bot.send_message(int(user_id), message)
+            except Exception as e:
+                # Користувач міг не починати діалог з ботом
+                logger.warning(f"Не вдалося надіслати нагадування {user_id}: {e}")
+
+    # Дайджест у чат команди
+    if TEAM_CHAT_ID:
+        header = f"📋 Завислі завдання (понад {REMINDER_STALE_DAYS} дн;): {len(stale_tasks)}"
+        for message in split_message(format_stale_tasks(header, stale_tasks)):
+            try:
+                await application.bot.send_message(TEAM_CHAT_ID, message)
+            except Exception as e:
+                logger.error(f"Не вдалося надіслати дайджест у чат команди: {e}")
+
+# --- Знімок кешу (теплий старт) ---
+
+async def validate_cache_snapshot(application):
+    """Після старту звіряє кеш (відновлений зі знімка або порожній) з таблицями поза циклом подій;"""
+    sheets = application.bot_data['sheets_helper']
+    if not sheets.spreadsheet:
+        return
+    try:
+        await asyncio.to_thread(sheets.validate_snapshot)
+    except Exception as e:
+        # Дані зі знімка й далі відповідають з позначкою часу; наступна спроба — щоденне оновлення
+        logger.error(f"Не вдалося звірити кеш з таблицями: {e}")
+
+async def save_snapshot_job(context: ContextTypes.DEFAULT_TYPE):
+    """Періодично зберігає знімок кешу на диск;"""
+    try:
+        await asyncio.to_thread(context.application.bot_data['sheets_helper'].save_snapshot)
+    except Exception as e:
+        logger.error(f"Не вдалося зберегти знімок кешу: {e}")
+
 # --- Обробники команд Telegram (зміни в parse_title_and_chapters та new_chapter) ---
 
+async def enqueue_sheets_write(update: Update, context: ContextTypes.DEFAULT_TYPE, op, args, parse_mode=None):
+    """Записує зміну в outbox і одразу відповідає користувачу (без очікування Google Sheets);"""
+    outbox = context.application.bot_data['outbox']
+    trace = _current_trace.get()
+    with trace_span('outbox.append'):
+        outbox.append(op, args, chat_id=update.effective_chat.id, parse_mode=parse_mode, trace=trace.ref() if trace else None)
+    outbox.notify()
+    await update.message.reply_text(QUEUED_MESSAGE)
+
+def resolve_title(context: ContextTypes.DEFAULT_TYPE, title):
+    """Назва тайтлу так; як вона записана в таблиці (якщо введена з іншим регістром чи пробілами);"""
+    if not title:
+        return title
+    return context.application.bot_data['sheets_helper'].title_index.canonical(title) or title
+
+async def inline_title_search(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Inline-пошук тайтлів (@бот назва) з індексу в пам'яті; вибраний результат надсилає /status;"""
+    sheets = context.application.bot_data['sheets_helper']
+    titles = sheets.title_index.search(update.inline_query.query, limit=INLINE_RESULTS_LIMIT)
+    results = [
+        InlineQueryResultArticle(
+            id=str(i),
+            title=title,
+            description='Показати статус тайтлу',
+            input_message_content=InputTextMessageContent(f'/status "{title}"'),
+        )
+        for i, title in enumerate(titles)
+    ]
+    await update.inline_query.answer(results, cache_time=INLINE_CACHE_SECONDS)
+
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # ВИПРАВЛЕННЯ: Використовуємо крапку з комою замість коми
     await update.message.reply_text("Привіт! Це бот для відстеження роботи над тайтлами; Використовуйте /help для списку команд;");
@@ -596,9 +2493,12 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "👥 `/team \"Назва Тайтлу\"`\n_Встановлює команду для тайтлу; Бот запитає про ролі;_\n\n"
         # ВИПРАВЛЕННЯ: Додано приклад дробового розділу та діапазону
         "➕ `/newchapter \"Назва Тайтлу\" <номер_розділу|діапазон>`\n_Додає новий розділ(и) до тайтлу; Назву брати в лапки! Діапазон: 1-20; 20; 20.5; 20.1-20.5_\n\n"
-        "📊 `/status \"Назва Тайтлу\" [номер_розділу|діапазон]`\n_Показує статус усіх розділів або вказаного діапазону;_\n\n"
+        "📊 `/status \"Назва Тайтлу\" [\"Інший Тайтл\" ...] [номер_розділу|діапазон]`\n_Показує статус усіх розділів або вказаного діапазону; Можна вказати кілька тайтлів;_\n\n"
+        "📁 `/export \"Назва Тайтлу\" [номер_розділу|діапазон] [csv|xlsx]`\n_Надсилає файл з усіма розділами; ніками та датами;_\n\n"
+        "📥 `/import`\n_Масове створення тайтлів і команд з CSV-файлу; Надішліть файл з підписом /import;_\n\n"
         # ВИПРАВЛЕННЯ: Додано кому як розділювач для ніку
-        "🔄 `/updatestatus \"Назва Тайтлу\" <розділ> <роль> <+|->; <нік>`\n_Оновлює статус завдання; Нік необов'язковий; Ролі: клін, переклад, тайп, редакт, бета, публікація;_"
+        "🔄 `/updatestatus \"Назва Тайтлу\" <розділ> <роль> <+|->; <нік>`\n_Оновлює статус завдання; Нік необов'язковий; Ролі: клін, переклад, тайп, редакт, бета, публікація;_\n\n"
+        f"🔎 `@{context.bot.username} <частина назви>`\n_Пошук тайтлу в будь-якому чаті; Назву можна вводити з одруками;_"
     )
     await update.message.reply_text(help_text, parse_mode="Markdown")
 
@@ -609,11 +2509,9 @@ async def register(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("Будь ласка; вкажіть ваш нікнейм; Приклад: `/register Super Translator`")
         return
     nickname = " ".join(context.args)
-    # ВИПРАВЛЕННЯ: Використовуємо sheets з контексту
-    sheets = context.bot_data['sheets_helper']
     telegram_tag = f"@{user.username}" if user.username else user.full_name
-    response = sheets.register_user(user.id, telegram_tag, nickname)
-    await update.message.reply_text(response)
+    # Реєстрація записується в outbox і застосовується воркером
+    await enqueue_sheets_write(update, context, 'register', {'user_id': user.id, 'username': telegram_tag, 'nickname': nickname})
 
 # ВИПРАВЛЕННЯ: Виправлення синтаксичної помилки з поверненням значень
 def parse_title_and_args(text):
@@ -627,6 +2525,19 @@ def parse_title_and_args(text):
     remaining_text = text[match.end():].strip()
     return title, remaining_text 
 
+def parse_titles_and_args(text):
+    """Парсер для команд з кількома назвами в лапках підряд ("А" "Б" ...); повертає (список назв; решта тексту);"""
+    title, remaining_text = parse_title_and_args(text)
+    if not title:
+        return [], remaining_text
+    titles = [title]
+    match = re.match(r'\"(.*?)\"', remaining_text)
+    while match:
+        titles.append(match.group(1))
+        remaining_text = remaining_text[match.end():].strip()
+        match = re.match(r'\"(.*?)\"', remaining_text)
+    return titles, remaining_text
+
 # ЗМІНА 4: Оновлення parse_chapters_arg для підтримки дробових номерів
 def parse_chapters_arg(chapter_arg):
     """Парсер для аргументу розділу/діапазону (використовується в new_chapter та status);"""
@@ -688,54 +2599,97 @@ def parse_title_and_chapters_for_new(full_text):
 
 # ЗМІНА 6: Новий парсер для /status
 def parse_title_and_chapters_for_status(full_text):
-    """Парсер для /status: тайтл та ОПЦІЙНИЙ розділ або діапазон;"""
-    title, remaining_text = parse_title_and_args(full_text)
+    """Парсер для /status: один або кілька тайтлів та ОПЦІЙНИЙ розділ або діапазон (для всіх тайтлів);"""
+    titles, remaining_text = parse_titles_and_args(full_text)
     
-    if not title:
-        return None, None
+    if not titles:
+        return [], None
     
     # Якщо немає аргументів; повертаємо None для розділів (означає "всі")
     if not remaining_text:
-        return title, None
+        return titles, None
         
     # Якщо є аргумент; парсимо його як розділ/діапазон
     chapters = parse_chapters_arg(remaining_text)
-    return title, chapters
+    return titles, chapters
 
 async def new_chapter(update: Update, context: ContextTypes.DEFAULT_TYPE):
     full_text = " ".join(context.args)
     title, chapters = parse_title_and_chapters_for_new(full_text)
+    title = resolve_title(context, title)
     
     if not title or not chapters:
         # ВИПРАВЛЕННЯ: Використовуємо крапку з комою замість коми
         await update.message.reply_text('Невірний формат; Приклад: /newchapter "Тайтл" 15; /newchapter "Тайтл" 1-20')
         return
     
-    # ВИПРАВЛЕННЯ: Використовуємо sheets з контексту
-    sheets = context.application.bot_data['sheets_helper']
     user = update.effective_user
     telegram_tag = f"@{user.username}" if user.username else user.full_name
     nickname = user.first_name if not user.username else f"@{user.username}"
 
-    # Викликаємо нову функцію; яка обробляє список розділів
-    response = sheets.add_chapters(title, chapters, telegram_tag, nickname)
-    await update.message.reply_text(response)
+    # Додавання розділів записується в outbox і застосовується воркером
+    await enqueue_sheets_write(update, context, 'add_chapters', {
+        'title_name': title, 'chapter_numbers': chapters, 'telegram_tag': telegram_tag, 'nickname': nickname,
+    })
 
 async def status(update: Update, context: ContextTypes.DEFAULT_TYPE):
     full_text = " ".join(context.args)
     # ЗМІНА 7: Використовуємо новий парсер
-    title, chapters = parse_title_and_chapters_for_status(full_text)
+    titles, chapters = parse_title_and_chapters_for_status(full_text)
+    # Повторені назви показуються один раз
+    titles = list(dict.fromkeys(resolve_title(context, title) for title in titles if title))
     
-    if not title:
+    if not titles:
         # ВИПРАВЛЕННЯ: Використовуємо крапку з комою замість коми
-        await update.message.reply_text('Невірний формат; Приклад: /status "Тайтл" або /status "Тайтл" 1-5')
+        await update.message.reply_text('Невірний формат; Приклад: /status "Тайтл"; /status "Тайтл" 1-5 або /status "Тайтл 1" "Тайтл 2"')
         return
     
     # ВИПРАВЛЕННЯ: Використовуємо sheets з контексту
     sheets = context.application.bot_data['sheets_helper']
-    # ЗМІНА 8: Передаємо список розділів до get_status
-    response = sheets.get_status(title, chapter_numbers=chapters)
-    await update.message.reply_text(response, parse_mode="Markdown")
+    # ЗМІНА 8: Передаємо список розділів до get_statuses (кілька тайтлів читаються одним пакетом)
+    # Читання виконується поза циклом подій: вебхук і решта обробників не чекають на таблиці
+    responses = await asyncio.to_thread(sheets.get_statuses, titles, chapters)
+    # Статуси об'єднуються в одне повідомлення або кілька (ліміт Telegram)
+    for response in split_message("\n\n".join(responses).split("\n")):
+        await update.message.reply_text(response, parse_mode="Markdown")
+
+async def export_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Надсилає файл CSV (або XLSX) з усіма розділами тайтлу або вказаним діапазоном;"""
+    full_text = " ".join(context.args)
+    title, remaining_text = parse_title_and_args(full_text)
+    title = resolve_title(context, title)
+    usage = 'Невірний формат; Приклад: /export "Тайтл"; /export "Тайтл" 1-20; /export "Тайтл" xlsx'
+
+    if not title:
+        await update.message.reply_text(usage)
+        return
+
+    # Останній аргумент може бути форматом файлу
+    parts = remaining_text.split()
+    export_format = 'csv'
+    if parts and parts[-1].lower() in EXPORT_FORMATS:
+        export_format = parts.pop().lower()
+
+    chapters = None
+    if parts:
+        chapters = parse_chapters_arg(" ".join(parts))
+        if not chapters:
+            await update.message.reply_text(usage)
+            return
+
+    if export_format == 'xlsx' and Workbook is None:
+        await update.message.reply_text("⚠️ Експорт у XLSX недоступний (не встановлено openpyxl); Використайте CSV;")
+        return
+
+    sheets = context.application.bot_data['sheets_helper']
+    # Читання аркуша та запис файлу виконуються поза циклом подій
+    export_file, error = await asyncio.to_thread(sheets.export_title, title, chapters, export_format)
+    if error:
+        await update.message.reply_text(error)
+        return
+
+    with export_file:
+        await update.message.reply_document(document=export_file, filename=f"{title}.{export_format}")
 
 # --- ОНОВЛЕНИЙ ПАРСЕР ДЛЯ /updatestatus ---
 def parse_updatestatus_args(full_text):
@@ -779,45 +2733,36 @@ async def update_status(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # ЗМІНА: Використовуємо новий парсер
     # ВИПРАВЛЕННЯ: Додано п'яту змінну для явного ніка
     title, chapter, role, status_char, explicit_nickname = parse_updatestatus_args(full_text)
+    title = resolve_title(context, title)
     
     if not title or not chapter or not role or not status_char:
         # ВИПРАВЛЕННЯ: Використовуємо крапку з комою замість коми
         await update.message.reply_text('Невірний формат; Приклад: /updatestatus "Тайтл" 15 клін + або /updatestatus "Тайтл" 15 клін +; Super Translator`')
         return
     
-    # ВИПРАВЛЕННЯ: Використовуємо sheets з контексту
-    sheets = context.application.bot_data['sheets_helper']
     user = update.effective_user
     
     # --- ОНОВЛЕННЯ ЛОГІКИ ВИЗНАЧЕННЯ НІКНЕЙМА ---
-    if explicit_nickname:
-        # 1. Нік вказано в команді (після крапки з комою)
-        nickname = explicit_nickname
-    else:
-        # 2. Нік не вказано; шукаємо зареєстрований
-        registered_nickname = sheets.get_nickname_by_id(user.id)
-        
-        if registered_nickname:
-            # Використовуємо зареєстрований нік
-            nickname = registered_nickname
-        else:
-            # 3. Якщо нік не зареєстрований; беремо з Telegram-профілю (як fallback)
-            nickname = user.first_name
-            if user.username:
-                nickname = f"@{user.username}"
+    # 1. Нік вказано в команді (після крапки з комою); інакше воркер шукає зареєстрований;
+    # 2. Якщо нік не зареєстрований; береться з Telegram-профілю (як fallback)
+    fallback_nickname = f"@{user.username}" if user.username else user.first_name
             
     # Telegram-тег для логування
     telegram_tag = f"@{user.username}" if user.username else user.full_name
 
-    # Передаємо telegram_tag до методу update_chapter_status
-    response = sheets.update_chapter_status(title, chapter, role, status_char, nickname, telegram_tag)
-    await update.message.reply_text(response)
+    # Оновлення статусу записується в outbox і застосовується воркером
+    await enqueue_sheets_write(update, context, 'update_status', {
+        'title_name': title, 'chapter_number': chapter, 'role_name': role, 'status_char': status_char,
+        'telegram_tag': telegram_tag, 'user_id': user.id, 'fallback_nickname': fallback_nickname,
+        'nickname': explicit_nickname,
+    })
 
 # --- ОБРОБНИК КОМАНДИ /team ---
 async def team_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обробляє команду /team \"Назва тайтлу\" та запитує ніки для ролей;"""
     full_text = " ".join(context.args)
     title, _ = parse_title_and_args(full_text)
+    title = resolve_title(context, title)
     
     if not title:
         # ВИПРАВЛЕННЯ: Використовуємо крапку з комою замість коми
@@ -839,28 +2784,157 @@ async def team_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     await update.message.reply_text(prompt, parse_mode="Markdown")
 
+def parse_team_input(raw_input):
+    """
+    Парсер складу команди (`клін - нік; переклад - нік; ...`); спільний для /team та імпорту CSV;
+    Повертає (рядок команди для A2; нік бети; список відсутніх обов'язкових ролей);
+    """
+    # Регулярний вираз для парсингу: роль - нік
+    pattern = re.compile(r'(клін|переклад|тайп|редакт|ред|бета)\s*-\s*([^;]+)', re.IGNORECASE)
+    matches = pattern.findall(raw_input)
+    
+    team_nicks = {}
+    for role, nick in matches:
+        role_lower = role.lower()
+        if role_lower == 'ред':
+            role_lower = 'редакт'
+        team_nicks[role_lower] = nick.strip()
+
+    # Обов'язкові ролі
+    required_roles = ['клін', 'переклад', 'тайп', 'редакт']
+    missing_roles = [r for r in required_roles if r not in team_nicks]
+    if missing_roles:
+        return None, "", missing_roles
+
+    # Створення загального рядка команди для клітинки A2
+    team_string_parts = []
+    beta_nickname = ""
+    for role_key in required_roles:
+        # ВИПРАВЛЕННЯ: Використовуємо крапку з комою як розділювач в team_string
+        team_string_parts.append(f"{role_key} - {team_nicks[role_key]}")
+    
+    if 'бета' in team_nicks:
+        beta_nickname = team_nicks['бета']
+        # ВИПРАВЛЕННЯ: Використовуємо крапку з комою як розділювач в team_string
+        team_string_parts.append(f"бета - {beta_nickname}")
+
+    # ВИПРАВЛЕННЯ: Використовуємо крапку з комою як розділювач в team_string
+    return "; ".join(team_string_parts), beta_nickname, []
+
+def parse_import_csv(data):
+    """
+    Парсер CSV для /import: рядок заголовків (тайтл; ролі окремими колонками або 'команда'; опційно 'розділи');
+    Повертає (список тайтлів для import_titles; список помилок з номерами рядків);
+    """
+    try:
+        text = data.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        text = data.decode('cp1251') # CSV з Excel у кирилічній локалі
+    try:
+        dialect = csv.Sniffer().sniff(text[:4096], delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    rows = [row for row in csv.reader(io.StringIO(text), dialect)]
+    if not rows:
+        return [], ["Файл порожній;"]
+
+    columns = {}
+    for i, header in enumerate(rows[0]):
+        field = IMPORT_COLUMNS.get(header.strip().lower())
+        if field:
+            columns.setdefault(field, i)
+    if 'title' not in columns:
+        return [], ["Немає колонки 'тайтл';"]
+    role_columns = [role for role in ('клін', 'переклад', 'тайп', 'редакт', 'бета') if role in columns]
+    if 'team' not in columns and not role_columns:
+        return [], ["Немає колонки 'команда' або колонок ролей (клін; переклад; тайп; редакт; бета);"]
+
+    def cell(row, field):
+        i = columns.get(field)
+        return row[i].strip() if i is not None and i < len(row) else ''
+
+    entries = []
+    errors = []
+    seen = set()
+    for line_number, row in enumerate(rows[1:], start=2):
+        if not any(value.strip() for value in row):
+            continue
+        title_name = cell(row, 'title')
+        if not title_name:
+            errors.append(f"Рядок {line_number}: не вказано тайтл;")
+            continue
+        if title_name.lower() in seen:
+            errors.append(f"Рядок {line_number}: тайтл '{title_name}' вже є у файлі;")
+            continue
+        seen.add(title_name.lower())
+
+        team_input = cell(row, 'team') or "; ".join(f"{role} - {cell(row, role)}" for role in role_columns if cell(row, role))
+        team_string, _, missing_roles = parse_team_input(team_input)
+        if missing_roles:
+            errors.append(f"Рядок {line_number}: не вказано обов'язкові ролі: {'; '.join(missing_roles)};")
+            continue
+
+        chapter_arg = cell(row, 'chapters')
+        chapters = parse_chapters_arg(chapter_arg) if chapter_arg else []
+        if chapters is None:
+            errors.append(f"Рядок {line_number}: невірний номер або діапазон розділів '{chapter_arg}';")
+            continue
+        entries.append({'title_name': title_name, 'team_string': team_string, 'chapter_numbers': chapters})
+
+    if len(entries) > IMPORT_MAX_TITLES:
+        errors.append(f"Забагато тайтлів в одному файлі ({len(entries)}); максимум {IMPORT_MAX_TITLES};")
+    return entries, errors
+
+async def import_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Пояснює формат файлу для /import (сам файл надсилається документом з підписом /import);"""
+    await update.message.reply_text(
+        "📥 Надішліть CSV-файл з підписом `/import`;\n\n"
+        "Перший рядок — назви колонок:\n"
+        "`тайтл,клін,переклад,тайп,редакт,бета,розділи`\n"
+        "`Тайтл 1,нік,нік,нік,нік,,1-20`\n\n"
+        "Бета та розділи необов'язкові; замість колонок ролей можна вказати одну колонку `команда` "
+        "(`клін - нік; переклад - нік; ...`); Існуючим тайтлам оновлюється команда і додаються нові розділи;",
+        parse_mode="Markdown",
+    )
+
+async def import_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Імпорт тайтлів з CSV-документа (підпис /import): весь файл — одна операція outbox;"""
+    document = update.message.document
+    if document.file_size and document.file_size > IMPORT_MAX_BYTES:
+        await update.message.reply_text(f"❌ Файл завеликий; максимум {IMPORT_MAX_BYTES // 1024} КБ;")
+        return
+
+    telegram_file = await document.get_file()
+    data = bytes(await telegram_file.download_as_bytearray())
+    entries, errors = parse_import_csv(data)
+    if errors:
+        for message in split_message(["❌ Файл не імпортовано; виправте помилки:"] + errors):
+            await update.message.reply_text(message)
+        return
+    if not entries:
+        await update.message.reply_text("⚠️ У файлі немає тайтлів;")
+        return
+
+    # Назви існуючих тайтлів так; як вони записані в таблиці
+    for entry in entries:
+        entry['title_name'] = resolve_title(context, entry['title_name'])
+
+    user = update.effective_user
+    telegram_tag = f"@{user.username}" if user.username else user.full_name
+    nickname = user.first_name if not user.username else f"@{user.username}"
+
+    # Імпорт записується в outbox і застосовується воркером
+    await enqueue_sheets_write(update, context, 'import_titles', {
+        'titles': entries, 'telegram_tag': telegram_tag, 'nickname': nickname,
+    })
+
 # Обробник текстових повідомлень; який буде слухати після /team
 async def handle_team_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обробляє введення користувача після команди /team;"""
     # Перевіряємо; чи ми очікуємо введення команди і чи є тайтл у контексті
     if context.user_data.get('awaiting_team_input') and 'setting_team_for_title' in context.user_data:
         title_name = context.user_data['setting_team_for_title']
-        raw_input = update.message.text
-        
-        # Регулярний вираз для парсингу: роль - нік
-        pattern = re.compile(r'(клін|переклад|тайп|редакт|ред|бета)\s*-\s*([^;]+)', re.IGNORECASE)
-        matches = pattern.findall(raw_input)
-        
-        team_nicks = {}
-        for role, nick in matches:
-            role_lower = role.lower()
-            if role_lower == 'ред':
-                role_lower = 'редакт'
-            team_nicks[role_lower] = nick.strip()
-
-        # Обов'язкові ролі
-        required_roles = ['клін', 'переклад', 'тайп', 'редакт']
-        missing_roles = [r for r in required_roles if r not in team_nicks]
+        final_team_string, beta_nickname, missing_roles = parse_team_input(update.message.text)
 
         if missing_roles:
             # Очищуємо контекст і повертаємо помилку
@@ -871,40 +2945,128 @@ async def handle_team_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 f"❌ Помилка: Не вказано обов'язкові ролі: {'; '.join(missing_roles)}; Спробуйте ще раз; починаючи з `/team`;"
             )
 
-        # Створення загального рядка команди для клітинки A2
-        team_string_parts = []
-        beta_nickname = ""
-        for role_key in required_roles:
-            # ВИПРАВЛЕННЯ: Використовуємо крапку з комою як розділювач в team_string
-            team_string_parts.append(f"{role_key} - {team_nicks[role_key]}")
-        
-        if 'бета' in team_nicks:
-            beta_nickname = team_nicks['бета']
-            # ВИПРАВЛЕННЯ: Використовуємо крапку з комою як розділювач в team_string
-            team_string_parts.append(f"бета - {beta_nickname}")
-
-        # ВИПРАВЛЕННЯ: Використовуємо крапку з комою як розділювач в team_string
-        final_team_string = "; ".join(team_string_parts)
-
         # Отримуємо дані користувача для логування
         user = update.effective_user
         telegram_tag = f"@{user.username}" if user.username else user.full_name
         nickname = user.first_name if not user.username else f"@{user.username}"
 
-        # ВИПРАВЛЕННЯ: Використовуємо sheets з контексту
-        sheets = context.application.bot_data['sheets_helper']
-        response = sheets.set_team(title_name, final_team_string, beta_nickname, telegram_tag, nickname)
-
         # Очищуємо контекст
         del context.user_data['awaiting_team_input']
         del context.user_data['setting_team_for_title']
 
-        await update.message.reply_text(response, parse_mode="Markdown")
+        # Встановлення команди записується в outbox і застосовується воркером
+        await enqueue_sheets_write(update, context, 'set_team', {
+            'title_name': title_name, 'team_string': final_team_string, 'beta_nickname': beta_nickname,
+            'telegram_tag': telegram_tag, 'nickname': nickname,
+        }, parse_mode="Markdown")
         
         return
 
 # --- MAIN RUNNER ---
 
+# --- Складання застосунку (спільне для run_bot та loadtest.py) ---
+
+def build_application(token, persistence=True, base_url=None):
+    """Створює Application з усіма обробниками; base_url дозволяє підмінити Bot API (для навантажувального тесту);"""
+    context_types = ContextTypes(bot_data=BotData)
+    builder = ApplicationBuilder().token(token).context_types(context_types)
+    if TRACE_UPDATES:
+        # Без трасування — звичайні класи; тож вимкнене трасування нічого не коштує
+        builder = builder.application_class(TracedApplication).request(TracedHTTPXRequest(connection_pool_size=256))
+    if persistence:
+        builder = builder.persistence(build_persistence(context_types))
+    if base_url:
+        builder = builder.base_url(base_url)
+    bot_app = builder.build()
+
+    # Команди
+    bot_app.add_handler(CommandHandler("start", start_command))
+    bot_app.add_handler(CommandHandler("help", help_command))
+    bot_app.add_handler(CommandHandler("register", register))
+    bot_app.add_handler(CommandHandler("team", team_command))
+    bot_app.add_handler(CommandHandler("newchapter", new_chapter))
+    bot_app.add_handler(CommandHandler("status", status))
+    bot_app.add_handler(CommandHandler("export", export_command))
+    bot_app.add_handler(CommandHandler("updatestatus", update_status))
+    bot_app.add_handler(CommandHandler("import", import_command))
+    # CSV-файл з підписом /import (підписи не обробляються CommandHandler)
+    bot_app.add_handler(MessageHandler(filters.Document.FileExtension("csv") & filters.CaptionRegex(r'^/import\b'), import_document))
+    
+    # Обробник для відповіді на команду /team
+    bot_app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_team_input))
+
+    # Inline-пошук тайтлів (потрібно увімкнути inline-режим у @BotFather)
+    bot_app.add_handler(InlineQueryHandler(inline_title_search))
+    return bot_app
+
+async def start_application(bot_app, sheets_helper, outbox):
+    """Запускає Application; outbox-воркер; щоденні нагадування та знімки кешу; повертає задачу воркера;"""
+    await bot_app.initialize()
+    # Об'єкти процесу додаються після initialize(); бо він завантажує bot_data зі сховища
+    bot_app.bot_data['sheets_helper'] = sheets_helper
+    bot_app.bot_data['outbox'] = outbox
+    await bot_app.start()
+
+    # Фоновий воркер; що переносить зміни з outbox у Google Sheets
+    worker = bot_app.create_task(outbox_worker(bot_app))
+
+    # Кеш звіряється з таблицями у фоні; до того відповіді беруться зі знімка (з позначкою часу даних)
+    if sheets_helper.snapshot_file:
+        bot_app.create_task(validate_cache_snapshot(bot_app))
+
+    # Щоденні нагадування про завислі завдання (потрібен python-telegram-bot[job-queue])
+    if bot_app.job_queue:
+        hours, minutes = (int(part) for part in REMINDER_TIME.split(':'))
+        bot_app.job_queue.run_daily(stale_tasks_job, time=dt_time(hour=hours, minute=minutes), name='stale_tasks')
+        if sheets_helper.snapshot_file:
+            bot_app.job_queue.run_repeating(save_snapshot_job, interval=CACHE_SNAPSHOT_INTERVAL, first=CACHE_SNAPSHOT_INTERVAL, name='cache_snapshot')
+    else:
+        logger.warning("JobQueue недоступна; нагадування про завислі завдання та періодичні знімки кешу вимкнено;")
+    return worker
+
+async def webhook_handler(request):
+    """Обробник вхідних POST-запитів від Telegram;"""
+    bot_app = request.app['bot_app']
+    trace = Trace('update') if TRACE_UPDATES else None
+    # Отримання та десеріалізація оновлення з тіла запиту
+    try:
+        with _NULL_SPAN if trace is None else TraceSpan(trace, 'parse'):
+            update = Update.de_json(await request.json(), bot_app.bot)
+    except Exception as e:
+        # ВИПРАВЛЕННЯ: Використовуємо крапку з комою замість коми
+        logger.error(f"Помилка десеріалізації оновлення: {e}")
+        return web.Response(status=400)
+
+    # Повторну доставку (в т;ч; на іншу репліку) підтверджуємо; але не обробляємо вдруге
+    if await request.app['deduplicator'].is_duplicate(update.update_id):
+        return web.Response()
+
+    if trace is not None:
+        trace.mark('dedup')
+        message = update.effective_message
+        if message and message.text:
+            trace.name = message.text.split(maxsplit=1)[0] if message.text.startswith('/') else 'text'
+        bot_app.pending_traces[update.update_id] = trace
+        
+    # Поміщення оновлення в чергу Application
+    await bot_app.update_queue.put(update)
+    return web.Response() # Telegram очікує 200 OK
+
+def build_web_app(bot_app, webhook_path):
+    """Веб-застосунок aiohttp з маршрутом вебхука та перевіркою працездатності;"""
+    persistence = bot_app.persistence
+    redis_client = persistence.redis if isinstance(persistence, RedisPersistence) else None
+
+    aio_app = web.Application()
+    aio_app['bot_app'] = bot_app # Зберігаємо Application у додатку aiohttp
+    aio_app['deduplicator'] = UpdateDeduplicator(redis_client)
+    # ВИПРАВЛЕННЯ СИНТАКСИЧНОЇ ПОМИЛКИ: Крапка з комою замінена на кому (роздільник елементів списку)
+    aio_app.add_routes([
+        web.get('/health', lambda r: web.Response(text='OK')), # Перевірка працездатності
+        web.post(webhook_path, webhook_handler), # Обробник для Telegram
+    ])
+    return aio_app
+
 async def run_bot():
     """Основна функція для запуску бота;"""
     # Додати до функції async def run_bot():
@@ -921,58 +3083,26 @@ async def run_bot():
         logger.error("Критична помилка: Змінна середовища SPREADSHEET_KEY не встановлена; Вкажіть ID вашої Google Таблиці; Бот не буде запущений;")
         return
     
-    # Ініціалізація SheetsHelper
+    # Ініціалізація outbox та SheetsHelper
     # ВИПРАВЛЕННЯ СИНТАКСИЧНОЇ ПОМИЛКИ: Крапка з комою замінена на кому (роздільник аргументів)
-    sheets_helper = SheetsHelper(GOOGLE_CREDENTIALS_FILE, SPREADSHEET_KEY)
+    outbox = SheetsOutbox(OUTBOX_FILE)
+    sheets_helper = SheetsHelper(
+        GOOGLE_CREDENTIALS_FILE, SPREADSHEET_KEY, outbox=outbox, shard_keys=SPREADSHEET_SHARD_KEYS,
+        snapshot_file=CACHE_SNAPSHOT_FILE or None,
+    )
     if not sheets_helper.spreadsheet:
-        # ВИПРАВЛЕННЯ: Використовуємо крапку з комою замість коми
-        logger.error("Не вдалося ініціалізувати Google Sheets; Бот не буде запущений;")
-        return
-
-    # Ініціалізація Telegram-бота
-    bot_app = ApplicationBuilder().token(TELEGRAM_BOT_TOKEN).build()
-    bot_app.bot_data['sheets_helper'] = sheets_helper
-    
-    # Команди
-    bot_app.add_handler(CommandHandler("start", start_command))
-    bot_app.add_handler(CommandHandler("help", help_command))
-    bot_app.add_handler(CommandHandler("register", register))
-    bot_app.add_handler(CommandHandler("team", team_command))
-    bot_app.add_handler(CommandHandler("newchapter", new_chapter))
-    bot_app.add_handler(CommandHandler("status", status))
-    bot_app.add_handler(CommandHandler("updatestatus", update_status))
-    
-    # Обробник для відповіді на команду /team
-    bot_app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_team_input))
+        # Бот все одно запускається: зміни накопичуються в outbox; воркер перепідключиться
+        logger.warning("Google Sheets зараз недоступні; Зміни буде збережено в outbox до відновлення підключення;")
 
- # запуск бота для вебхуків
-    await bot_app.initialize()
-    await bot_app.start()
+    # Ініціалізація Telegram-бота (стан розмов зберігається між перезапусками та репліками)
+    bot_app = build_application(TELEGRAM_BOT_TOKEN)
+    await start_application(bot_app, sheets_helper, outbox)
 
     if not hasattr(bot_app, 'update_queue'):
         # ВИПРАВЛЕННЯ: Використовуємо крапку з комою замість коми
         logger.error("bot_app has no update_queue attribute!")
         return
         
-    # 4. Налаштування веб-сервера aiohttp
-    aio_app = web.Application()
-    aio_app['bot_app'] = bot_app # Зберігаємо Application у додатку aiohttp
-    
-    async def webhook_handler(request):
-        """Обробник вхідних POST-запитів від Telegram;"""
-        bot_app = request.app['bot_app']
-        # Отримання та десеріалізація оновлення з тіла запиту
-        try:
-            update = Update.de_json(await request.json(), bot_app.bot)
-        except Exception as e:
-            # ВИПРАВЛЕННЯ: Використовуємо крапку з комою замість коми
-            logger.error(f"Помилка десеріалізації оновлення: {e}")
-            return web.Response(status=400)
-            
-        # Поміщення оновлення в чергу Application
-        await bot_app.update_queue.put(update)
-        return web.Response() # Telegram очікує 200 OK
-    
     # Встановлення вебхука на сервері Telegram
     webhook_path = '/' + TELEGRAM_BOT_TOKEN
     full_webhook_url = WEBHOOK_URL.rstrip('/') + webhook_path
@@ -981,15 +3111,10 @@ async def run_bot():
     # ВИПРАВЛЕННЯ: Використовуємо крапку з комою замість коми
     logger.info(f"Встановлено Webhook на: {full_webhook_url}")
     
-    # 5. Налаштування маршрутів aiohttp
-    # ВИПРАВЛЕННЯ: Використовуємо крапку з комою замість коми
-    # ВИПРАВЛЕННЯ СИНТАКСИЧНОЇ ПОМИЛКИ: Крапка з комою замінена на кому (роздільник елементів списку)
-    aio_app.add_routes([
-        web.get('/health', lambda r: web.Response(text='OK')), # Перевірка працездатності
-        web.post(webhook_path, webhook_handler), # Обробник для Telegram
-    ])
+    # 4. Налаштування веб-сервера aiohttp та маршрутів
+    aio_app = build_web_app(bot_app, webhook_path)
 
-    # 6. Запуск веб-сервера
+    # 5. Запуск веб-сервера
     runner = web.AppRunner(aio_app)
     await runner.setup()
     